@@ -0,0 +1,210 @@
+import gzip
+import json
+from flask import Blueprint, Response, abort, current_app, request
+from models import db, Venue, Artist
+from queries import (
+    venue_detail,
+    artist_detail,
+    VenueDetail,
+    ArtistDetail,
+    shows_page,
+    SHOW_FIELDS,
+    entity_page,
+    search,
+    venue_occupancy,
+    artist_occupancy,
+    calendar_range,
+    InvalidCursor
+)
+from booking import free_windows, parse_time
+from cache import cache, venue_key, artist_key
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# columns clients may ask for with ?fields=; anything else is a 400
+ENTITY_FIELDS = {
+    Venue: ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+            'website', 'seeking_talent', 'seeking_description', 'genres'],
+    Artist: ['id', 'name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+             'website', 'seeking_venue', 'seeking_description', 'genres'],
+}
+DETAIL_FIELDS = {
+    Venue: list(VenueDetail._fields),
+    Artist: list(ArtistDetail._fields),
+}
+SEARCH_FIELDS = ['id', 'name', 'num_upcoming_shows']
+
+#----------------------------------------------------------------------------#
+# Serialization.
+#----------------------------------------------------------------------------#
+
+def _default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, default=_default, separators=(',', ':')).encode('utf-8')
+
+def plain(value):
+    # query rows and detail views become dicts, tuples become lists
+    if hasattr(value, '_asdict'):
+        value = value._asdict()
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    return value
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+def requested_fields(allowed):
+    # the ?fields= list, None when absent; aborts with 400 on unknown names
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if any(field not in allowed for field in fields):
+        abort(400)
+    return fields
+
+def select_fields(row, fields):
+    row = plain(row)
+    if not fields:
+        return row
+    return {key: value for key, value in row.items() if key in fields}
+
+def page_response(page, fields=None):
+    data = [select_fields(row, fields) for row in page]
+    return json_response({'data': data, 'next': page.next_cursor})
+
+def page_limit():
+    limit = request.args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+    return max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+
+@api.after_request
+def compress(response):
+    # brotli when available and accepted, otherwise gzip, for bodies worth it
+    accepted = request.headers.get('Accept-Encoding', '')
+    if response.direct_passthrough or response.status_code != 200 or \
+            'Content-Encoding' in response.headers or \
+            response.content_length is None or response.content_length < 500:
+        return response
+    if brotli is not None and 'br' in accepted:
+        response.set_data(brotli.compress(response.get_data()))
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in accepted:
+        response.set_data(gzip.compress(response.get_data(), 6))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+    response.vary.add('Accept-Encoding')
+    return response
+
+@api.errorhandler(400)
+def bad_request(error):
+    return json_response({'error': 400, 'message': 'bad request'}, 400)
+
+@api.errorhandler(404)
+def not_found(error):
+    return json_response({'error': 404, 'message': 'resource not found'}, 404)
+
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+def _entity_list(model):
+    fields = requested_fields(ENTITY_FIELDS[model])
+    try:
+        page = entity_page(model, request.args.get('after'), page_limit(), fields=fields)
+    except InvalidCursor:
+        abort(400)
+    return page_response(page)
+
+def _entity_detail(model, key, loader):
+    # the whole detail view is loaded and cached once for every combination
+    # of fields; fields only trims the response
+    fields = requested_fields(DETAIL_FIELDS[model])
+    data = cache.get_or_set(key, loader)
+    if data is None:
+        abort(404)
+    return json_response(select_fields(data, fields))
+
+@api.route('/venues')
+def venues():
+    return _entity_list(Venue)
+
+@api.route('/artists')
+def artists():
+    return _entity_list(Artist)
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    return _entity_detail(Venue, venue_key(venue_id), lambda: venue_detail(venue_id))
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    return _entity_detail(Artist, artist_key(artist_id), lambda: artist_detail(artist_id))
+
+@api.route('/venues/<int:venue_id>/free')
+def venue_free(venue_id):
+    # free windows at a venue, e.g. ?start=2021-06-01&end=2021-06-08
+    try:
+        start = parse_time(request.args['start'])
+        end = parse_time(request.args['end'])
+    except (KeyError, ValueError, OverflowError):
+        abort(400)
+    if end <= start:
+        abort(400)
+    windows = free_windows(venue_id, start, end)
+    return json_response({'data': [{'start': window[0], 'end': window[1]} for window in windows]})
+
+def _calendar(model, entity_id, occupancy):
+    if db.session.query(model.id).filter(model.id == entity_id).first() is None:
+        abort(404)
+    try:
+        start, end = calendar_range(request.args.get('start'), request.args.get('months'))
+    except ValueError:
+        abort(400)
+    days = occupancy(entity_id, start, end)
+    return json_response({'start': start, 'end': end, 'booked': [days[day]._asdict() for day in sorted(days)]})
+
+@api.route('/venues/<int:venue_id>/calendar')
+def venue_calendar(venue_id):
+    # booked days of a venue, e.g. ?start=2021-06&months=12
+    return _calendar(Venue, venue_id, venue_occupancy)
+
+@api.route('/artists/<int:artist_id>/calendar')
+def artist_calendar(artist_id):
+    return _calendar(Artist, artist_id, artist_occupancy)
+
+@api.route('/shows')
+def shows():
+    fields = requested_fields(SHOW_FIELDS)
+    try:
+        page = shows_page(request.args.get('after'), page_limit(), fields=fields)
+    except InvalidCursor:
+        abort(400)
+    return page_response(page, fields)
+
+@api.route('/search/<entity>')
+def search_entities(entity):
+    models = {'venues': Venue, 'artists': Artist}
+    if entity not in models:
+        abort(404)
+    fields = requested_fields(SEARCH_FIELDS)
+    data = search(models[entity], request.args.get('q', ''))
+    return json_response({'count': len(data), 'data': [select_fields(row, fields) for row in data]})
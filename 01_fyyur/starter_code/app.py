@@ -2,42 +2,111 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import dateutil.parser
-import babel
+import hashlib
+import sys
+from functools import lru_cache
+
+import click
 from flask import (
   Flask, 
+  current_app,
   render_template, 
   request, 
   Response, 
+  stream_with_context,
   flash, 
+  get_flashed_messages,
   redirect, 
-  url_for
-)
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from forms import *
-from flask_migrate import Migrate
-import sys
-from sqlalchemy import (
-  func, 
-  case, 
-  desc
+  url_for,
+  abort,
+  jsonify,
+  session,
+  before_render_template,
+  template_rendered
 )
-from datetime import date
+from flask.cli import FlaskGroup
+from jinja2.environment import TemplateStream
+from forms import VenueForm, ArtistForm, ShowForm
 from models import db, Venue, Artist, Show
+from queries import (
+  venue_areas,
+  search,
+  venue_detail,
+  artist_detail,
+  shows_page,
+  artists_page,
+  recently_listed,
+  venue_version,
+  artist_version,
+  partner_ids,
+  venue_occupancy,
+  artist_occupancy,
+  calendar_range,
+  calendar_months,
+  InvalidCursor
+)
+from cache import cache, fragments, venue_key, artist_key
+from pool import pool
+from instrumentation import sql_stats
+from logs import logs
+from profiling import profiler
+from templating import templates, precompile_command
+from api import api
+from booking import book_shows
+from counters import shows_removed, venue_shows, roll_counters_command, check_counters_command
+from bulk import import_command, export_command, stream_export, ENTITIES
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db.init_app(app)
-migrate = Migrate(app, db)
+# `flask` options that take a value, so their value is not taken for the command
+FLASK_OPTIONS_WITH_VALUES = ('-A', '--app', '-e', '--env-file')
+
+def cli_command(argv=None):
+  # the command name `flask` was run with, or None outside of `flask`; uvicorn
+  # and `flask run` also build the app inside a click context
+  context = click.get_current_context(silent=True)
+  if context is None or not isinstance(context.find_root().command, FlaskGroup):
+    return None
+  args = iter((sys.argv if argv is None else argv)[1:])
+  for arg in args:
+    if arg in FLASK_OPTIONS_WITH_VALUES:
+      next(args, None)
+    elif not arg.startswith('-'):
+      return arg
+  return None
+
+def create_app(config=None):
+  # config: a mapping or an object/import path applied over config.py
+  app = Flask(__name__)
+  app.config.from_object('config')
+  if isinstance(config, dict):
+    app.config.from_mapping(config)
+  elif config is not None:
+    app.config.from_object(config)
+  pool.init_app(app)
+  db.init_app(app)
+  if cli_command() == 'db':
+    # only the `flask db` commands need Alembic, so workers never import it
+    from flask_migrate import Migrate
+    Migrate(app, db)
+  logs.init_app(app)
+  cache.init_app(app)
+  templates.init_app(app)
+  sql_stats.init_app(app)
+  app.cli.add_command(import_command)
+  app.cli.add_command(export_command)
+  app.cli.add_command(roll_counters_command)
+  app.cli.add_command(check_counters_command)
+  app.cli.add_command(precompile_command)
+  app.jinja_env.filters['datetime'] = format_datetime
+  for rule, view, methods in ROUTES:
+    app.add_url_rule(rule, view.__name__, view, methods=methods)
+  for code, handler in ERROR_HANDLERS:
+    app.register_error_handler(code, handler)
+  app.register_blueprint(api)
+  profiler.init_app(app)
+  return app
 
 # TODO: connect to a local postgresql database
 
@@ -50,89 +119,190 @@ migrate = Migrate(app, db)
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma"
+}
+# Babel's named formats, built from the locale data; full and medium are
+# replaced by the patterns above
+BABEL_FORMATS = ('full', 'long', 'medium', 'short')
+
+# Babel and dateutil are imported on first use, which keeps them (and Babel's
+# locale data) out of worker start-up
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format):
+  import babel.dates
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+@lru_cache(maxsize=None)
+def datetime_locale(locale):
+  import babel
+  return babel.Locale.parse(locale)
+
+@lru_cache(maxsize=4096)
+def _format_datetime(value, format, locale):
+  import babel.dates
   if isinstance(value, str):
-    date = dateutil.parser.parse(value)
-  else:
-    date = value
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  if format in BABEL_FORMATS and format not in DATETIME_FORMATS:
+    return babel.dates.format_datetime(value, format, locale=datetime_locale(locale))
+  if value.tzinfo is None:
+    # as babel.dates.format_datetime does, so zone fields read UTC
+    value = value.replace(tzinfo=babel.dates.UTC)
+  return datetime_pattern(format).apply(value, datetime_locale(locale))
 
-app.jinja_env.filters['datetime'] = format_datetime
+def format_datetime(value, format='medium'):
+  import babel.dates
+  if value is None:
+    return babel.dates.format_datetime(value, DATETIME_FORMATS.get(format, format))
+  return _format_datetime(value, format, babel.dates.LC_TIME)
+
+#----------------------------------------------------------------------------#
+# Listings.
+#----------------------------------------------------------------------------#
+
+def page_args():
+  limit = request.args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+  limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+  stream = request.args.get('stream', current_app.config['STREAM_LISTINGS'], type=lambda value: value.lower() in ('1', 'true', 'yes'))
+  return request.args.get('after'), request.args.get('before'), limit, stream
+
+def render_listing(template_name, stream, **context):
+  # streamed listings start sending the layout before the rows are fetched
+  if not stream:
+    return render_template(template_name, **context)
+  # the layout shows the flashed messages once the session cookie has been
+  # sent; popping them now (Flask keeps them for the rest of the request)
+  # saves the session without them
+  get_flashed_messages()
+  app = current_app._get_current_object()
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+
+  def generate():
+    # the render signals bracket the streaming, as render_template's do
+    before_render_template.send(app, template=template, context=context)
+    for chunk in template.generate(context):
+      yield chunk
+    template_rendered.send(app, template=template, context=context)
+
+  rv = TemplateStream(generate())
+  rv.enable_buffering(5)
+  return Response(stream_with_context(rv))
+
+def load_page(key, loader):
+  # only the default first page is cached, so invalidating `key` covers it
+  after, before, limit, stream = page_args()
+  try:
+    if after is None and before is None and not stream and limit == current_app.config['PAGE_SIZE']:
+      data = cache.get_or_set(key, lambda: loader(None, limit).freeze())
+    else:
+      data = loader(after, limit, stream, before=before)
+  except InvalidCursor:
+    abort(400)
+  return data, limit, stream
+
+def render_calendar(entity, kind, occupancy):
+  # a month grid of the entity's booked days, from one read of its day buckets
+  try:
+    start, end = calendar_range(request.args.get('start'), request.args.get('months'))
+  except ValueError:
+    abort(400)
+  months = calendar_months(start, end, occupancy(entity.id, start, end))
+  return render_template('pages/calendar.html', entity=entity, kind=kind, months=months)
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+def conditional_response(version, last_modified):
+  # an empty response carrying the validators; it becomes a 304 when the
+  # client's copy is current, otherwise the caller fills in the body
+  response = Response()
+  response.set_etag(hashlib.sha1(repr(version).encode('utf-8')).hexdigest())
+  response.last_modified = last_modified
+  response.cache_control.no_cache = True
+  if not session.get('_flashes'):
+    response.make_conditional(request)
+  return response
+
+#----------------------------------------------------------------------------#
+# Cache invalidation.
+#----------------------------------------------------------------------------#
+
+def venue_changed(venue_id, artist_ids=None):
+  # the venue's name and image also appear on its artists' pages and on /shows
+  if artist_ids is None:
+    artist_ids = partner_ids(Show.venue_id, Show.artist_id, venue_id)
+  cache.invalidate('index:venues', 'venues', 'shows', venue_key(venue_id), *[artist_key(artist_id) for artist_id in artist_ids])
+
+def artist_changed(artist_id):
+  venue_ids = partner_ids(Show.artist_id, Show.venue_id, artist_id)
+  cache.invalidate('index:artists', 'artists', 'shows', artist_key(artist_id), *[venue_key(venue_id) for venue_id in venue_ids])
+
+def show_added(venue_id, artist_id):
+  cache.invalidate('venues', 'shows', venue_key(venue_id), artist_key(artist_id))
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
 def index():
-  venues = Venue.query.order_by(desc(Venue.created_date)).limit(10).all()
-  artists = Artist.query.order_by(desc(Artist.created_date)).limit(10).all()
+  venues = cache.get_or_set('index:venues', lambda: recently_listed(Venue))
+  artists = cache.get_or_set('index:artists', lambda: recently_listed(Artist))
   return render_template('pages/home.html', venues=venues, artists=artists)
 
 
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
 def venues():
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  data = []
-  addresses = db.session.query(Venue.city, Venue.state).distinct(Venue.city, Venue.state).all()
-  for address in addresses:
-    body = {}
-    body['city'] = address.city
-    body['state'] = address.state
-    venues = db.session.query(Venue).filter_by(state=address.state).filter_by(city=address.city).all()
-    venue_info = []
-    for venue in venues:
-      shows = db.session.query(Show).filter_by(venue_id=venue.id).filter(Show.start_time >= date.today()).all()
-      setattr(venue, 'num_upcoming_shows', len(shows))
-      venue_info.append(venue)
-    body['venues'] = venue_info
-    data.append(body)
+  data = cache.get_or_set('venues', venue_areas)
   return render_template('pages/venues.html', areas=data);
 
-@app.route('/venues/search', methods=['POST'])
 def search_venues():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  search = request.form.get('search_term', '')
-  data =  db.session.query(Venue.name, Venue.id, func.count(case([(Show.start_time >= date.today(), 1)])).label('num_upcoming_shows')).outerjoin(Show).filter(Venue.name.ilike("%" + search + "%")).group_by(Venue.id).all()
+  search_term = request.form.get('search_term', '')
+  data = search(Venue, search_term)
   response={
     "count": len(data),
     "data": data
   }
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
-@app.route('/venues/<int:venue_id>', methods=['GET'])
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  upcoming_shows = db.session.query(Show.artist_id, Artist.name.label("artist_name"), Artist.image_link.label("artist_image_link"), Show.start_time).join(Artist).filter(Show.venue_id == venue_id, Show.start_time >= date.today()).all()
-  past_shows = db.session.query(Show.artist_id, Artist.name.label("artist_name"), Artist.image_link.label("artist_image_link"), Show.start_time).join(Artist).filter(Show.venue_id == venue_id, Show.start_time < date.today()).all()
-  venue = db.session.query(Venue).filter_by(id=venue_id).first()
-  data = venue
-  setattr(data, 'upcoming_shows', upcoming_shows)
-  setattr(data, 'past_shows', past_shows)
-  setattr(data, 'past_shows_count', len(past_shows))
-  setattr(data, 'upcoming_shows_count', len(upcoming_shows))
-  return render_template('pages/show_venue.html', venue=data)
+  version = venue_version(venue_id)
+  if version is None:
+    abort(404)
+  response = conditional_response(*version)
+  if response.status_code == 304:
+    return response
+  # the body is cached under its ETag, so it always matches the validator
+  # sent with it, whatever another worker's cache or the date says
+  data = cache.get_or_set(venue_key(venue_id, response.get_etag()[0]), lambda: venue_detail(venue_id))
+  if data is None:
+    abort(404)
+  response.set_data(render_template('pages/show_venue.html', venue=data))
+  return response
+
+def venue_calendar(venue_id):
+  venue = db.session.query(Venue.id, Venue.name).filter(Venue.id == venue_id).first()
+  if venue is None:
+    abort(404)
+  return render_calendar(venue, 'venue', venue_occupancy)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
 def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   # TODO: insert form data as a new Venue record in the db, instead
   # TODO: modify data to be the data object returned from db insertion
@@ -144,11 +314,12 @@ def create_venue_submission():
     form.populate_obj(venue)
     db.session.add(venue)
     db.session.commit()
+    cache.invalidate('index:venues', 'venues')
     data = venue
   except Exception:
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    current_app.logger.exception('Venue could not be listed')
   finally:
     if error:
       flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
@@ -162,19 +333,21 @@ def create_venue_submission():
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
   return redirect(url_for("index"))
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
   # TODO: Complete this endpoint for taking a venue_id, and using
   # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
   error = False
   try:
     venue = Venue.query.get(venue_id)
+    artist_ids = partner_ids(Show.venue_id, Show.artist_id, venue.id)
+    shows_removed(venue_shows(venue.id))
     db.session.delete(venue)
     db.session.commit()
+    venue_changed(venue.id, artist_ids)
   except Exception:
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    current_app.logger.exception('Venue %s could not be deleted', venue_id)
   finally:
     db.session.close()
     if error:
@@ -188,49 +361,50 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
 def artists():
-  # TODO: replace with real data returned from querying the database
-  data = Artist.query.all()
-  return render_template('pages/artists.html', artists=data)
+  data, limit, stream = load_page('artists', artists_page)
+  return render_listing('pages/artists.html', stream, artists=data, limit=limit)
 
-@app.route('/artists/search', methods=['POST'])
 def search_artists():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
-  search = request.form.get('search_term', '')
-  data =  db.session.query(Artist.name, Artist.id, func.count(case([(Show.start_time >= date.today(), 1)])).label('num_upcoming_shows')).outerjoin(Show).filter(Artist.name.ilike("%" + search + "%")).group_by(Artist.id).all()
+  search_term = request.form.get('search_term', '')
+  data = search(Artist, search_term)
   response={
     "count": len(data),
     "data": data
   }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
-@app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  upcoming_shows = db.session.query(Show.venue_id.label('venue_id'), Venue.name.label("venue_name"), Venue.image_link.label("venue_image_link"), Show.start_time).join(Venue).filter(Show.artist_id == artist_id, Show.start_time >= date.today()).all()
-  past_shows = db.session.query(Show.venue_id.label('venue_id'), Venue.name.label("venue_name"), Venue.image_link.label("venue_image_link"), Show.start_time).join(Venue).filter(Show.artist_id == artist_id, Show.start_time < date.today()).all()
-  artist = db.session.query(Artist).filter_by(id=artist_id).first()
-  data = artist
-  setattr(data, 'upcoming_shows', upcoming_shows)
-  setattr(data, 'past_shows', past_shows)
-  setattr(data, 'past_shows_count', len(past_shows))
-  setattr(data, 'upcoming_shows_count', len(upcoming_shows))
-  return render_template('pages/show_artist.html', artist=data)
+  # shows the artist page with the given artist_id
+  version = artist_version(artist_id)
+  if version is None:
+    abort(404)
+  response = conditional_response(*version)
+  if response.status_code == 304:
+    return response
+  data = cache.get_or_set(artist_key(artist_id, response.get_etag()[0]), lambda: artist_detail(artist_id))
+  if data is None:
+    abort(404)
+  response.set_data(render_template('pages/show_artist.html', artist=data))
+  return response
+
+def artist_calendar(artist_id):
+  artist = db.session.query(Artist.id, Artist.name).filter(Artist.id == artist_id).first()
+  if artist is None:
+    abort(404)
+  return render_calendar(artist, 'artist', artist_occupancy)
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   artist = Artist.query.filter_by(id=artist_id).first()
   form = ArtistForm(obj=artist)
   # TODO: populate form with fields from artist with ID <artist_id>
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   # TODO: take values from the form submitted, and update existing
   # artist record with ID <artist_id> using the new attributes
@@ -250,21 +424,21 @@ def edit_artist_submission(artist_id):
     artist.seeking_description = request.form.get('seeking_description', '')
     artist.website = request.form.get('website', '')
     db.session.commit()
+    artist_changed(artist_id)
   except Exception:
     db.session.rollback()
+    current_app.logger.exception('Artist %s could not be updated', artist_id)
   finally:
     db.session.close()
 
   return redirect(url_for('show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   venue = Venue.query.filter_by(id=venue_id).first()
   form = VenueForm(obj=venue)
   # TODO: populate form with values from venue with ID <venue_id>
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
   # TODO: take values from the form submitted, and update existing
   # venue record with ID <venue_id> using the new attributes
@@ -285,8 +459,10 @@ def edit_venue_submission(venue_id):
     venue.seeking_description = request.form.get('seeking_description', '')
     venue.website = request.form.get('website', '')
     db.session.commit()
+    venue_changed(venue_id)
   except Exception:
     db.session.rollback()
+    current_app.logger.exception('Venue %s could not be updated', venue_id)
   finally:
     db.session.close()
   return redirect(url_for('show_venue', venue_id=venue_id))
@@ -294,12 +470,10 @@ def edit_venue_submission(venue_id):
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   # called upon submitting the new artist listing form
   # TODO: insert form data as a new Venue record in the db, instead
@@ -312,11 +486,12 @@ def create_artist_submission():
     form.populate_obj(artist)
     db.session.add(artist)
     db.session.commit()
+    cache.invalidate('index:artists', 'artists')
     data = artist
   except Exception:
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    current_app.logger.exception('Artist could not be listed')
   finally:
     if error:
       flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
@@ -332,41 +507,41 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
 def shows():
   # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  data = db.session.query(Show.artist_id.label('artist_id'), Artist.name.label("artist_name"), Artist.image_link.label("artist_image_link"),Show.venue_id.label('venue_id'), Venue.name.label("venue_name"), Venue.image_link.label("venue_image_link"), Show.start_time).join(Venue).join(Artist).all()
-  return render_template('pages/shows.html', shows=data)
+  data, limit, stream = load_page('shows', shows_page)
+  return render_listing('pages/shows.html', stream, shows=data, limit=limit)
 
-@app.route('/shows/create')
 def create_shows():
   # renders form. do not touch.
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   # TODO: insert form data as a new Show record in the db, instead
   error = False
-  body = {}
+  result = {}
   try:
-    artist_id = request.form['artist_id']
-    venue_id = request.form['venue_id']
-    start_time = request.form['start_time']
-    show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
-    db.session.add(show)
-    db.session.commit()
-    body = show
+    results, created = book_shows([{
+      'artist_id': request.form.get('artist_id'),
+      'venue_id': request.form.get('venue_id'),
+      'start_time': request.form.get('start_time'),
+      'end_time': request.form.get('end_time')
+    }])
+    result = results[0]
+    for show in created:
+      show_added(show['venue_id'], show['artist_id'])
   except Exception:
     error = True
     db.session.rollback()
+    current_app.logger.exception('Show could not be listed')
   finally:
     db.session.close()
-  if error:
+  if error or result.get('status') == 'invalid':
     flash('An error occurred. Show could not be listed.')
+  elif result.get('status') == 'conflict':
+    flash('Show could not be listed. ' + ' '.join(sum(result['errors'].values(), [])))
   else:
     flash('Show listed!')
 
@@ -375,47 +550,130 @@ def create_show_submission():
   # e.g., flash('An error occurred. Show could not be listed.')
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
   return redirect(url_for("index"))
-@app.errorhandler(404)
+def create_shows_batch():
+  # creates a whole tour at once: a JSON list of {artist_id, venue_id, start_time}
+  items = request.get_json(silent=True)
+  if isinstance(items, dict):
+    items = items.get('shows')
+  if not isinstance(items, list) or len(items) > current_app.config['MAX_BATCH_SHOWS']:
+    return jsonify({'error': 400, 'message': 'Expected a list of at most {} shows.'.format(current_app.config['MAX_BATCH_SHOWS'])}), 400
+  try:
+    results, created = book_shows(items)
+  except Exception:
+    db.session.rollback()
+    current_app.logger.exception('Show batch could not be listed')
+    return jsonify({'error': 500, 'message': 'Shows could not be listed.'}), 500
+  finally:
+    db.session.close()
+  keys = set(['venues', 'shows'])
+  for show in created:
+    keys.update([venue_key(show['venue_id']), artist_key(show['artist_id'])])
+  cache.invalidate(*keys)
+  return jsonify({'created': len(created), 'results': results})
+
+#  Export
+#  ----------------------------------------------------------------
+
+def export(entity):
+  if entity not in ENTITIES:
+    abort(404)
+  compress = request.args.get('gzip', '') in ('1', 'true', 'yes')
+  filename = entity + ('.jsonl.gz' if compress else '.jsonl')
+  return Response(
+    stream_export(db.engine, entity, compress),
+    mimetype='application/gzip' if compress else 'application/x-ndjson',
+    headers={'Content-Disposition': 'attachment; filename=' + filename}
+  )
+
+#  Cache
+#  ----------------------------------------------------------------
+
+def cache_stats():
+  stats = cache.stats()
+  stats['fragments'] = fragments.stats()
+  return jsonify(stats)
+
+#  Health
+#  ----------------------------------------------------------------
+
+def healthz():
+  healthy, latency = pool.check(db.engine)
+  response = jsonify({
+    'status': 'ok' if healthy else 'unavailable',
+    'database': {'ok': healthy, 'latency_seconds': latency},
+    'pool': pool.stats(db.engine)
+  })
+  response.status_code = 200 if healthy else 503
+  response.cache_control.no_store = True
+  return response
+
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
-@app.errorhandler(400)
 def bad_request(error):
     return render_template('errors/400.html'), 400
 
-@app.errorhandler(401)
 def unauthorized(error):
     return render_template('errors/401.html'), 401
 
-@app.errorhandler(403)
 def forbidden(error):
     return render_template('errors/403.html'), 403
 
-@app.errorhandler(405)
 def invalid_method(error):
     return render_template('errors/405.html'), 405
 
-@app.errorhandler(409)
 def duplicate_resource(error):
     return render_template('errors/409.html'), 409
 
-@app.errorhandler(422)
 def not_processable(error):
     return render_template('errors/422.html'), 422
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+# (rule, view, methods); the endpoint is the view's name
+ROUTES = [
+  ('/', index, ['GET']),
+  ('/venues', venues, ['GET']),
+  ('/venues/search', search_venues, ['POST']),
+  ('/venues/<int:venue_id>', show_venue, ['GET']),
+  ('/venues/<int:venue_id>/calendar', venue_calendar, ['GET']),
+  ('/venues/create', create_venue_form, ['GET']),
+  ('/venues/create', create_venue_submission, ['POST']),
+  ('/venues/<venue_id>', delete_venue, ['DELETE']),
+  ('/artists', artists, ['GET']),
+  ('/artists/search', search_artists, ['POST']),
+  ('/artists/<int:artist_id>', show_artist, ['GET']),
+  ('/artists/<int:artist_id>/calendar', artist_calendar, ['GET']),
+  ('/artists/<int:artist_id>/edit', edit_artist, ['GET']),
+  ('/artists/<int:artist_id>/edit', edit_artist_submission, ['POST']),
+  ('/venues/<int:venue_id>/edit', edit_venue, ['GET']),
+  ('/venues/<int:venue_id>/edit', edit_venue_submission, ['POST']),
+  ('/artists/create', create_artist_form, ['GET']),
+  ('/artists/create', create_artist_submission, ['POST']),
+  ('/shows', shows, ['GET']),
+  ('/shows/create', create_shows, ['GET']),
+  ('/shows/create', create_show_submission, ['POST']),
+  ('/shows/batch', create_shows_batch, ['POST']),
+  ('/export/<entity>.jsonl', export, ['GET']),
+  ('/cache/stats', cache_stats, ['GET']),
+  ('/healthz', healthz, ['GET']),
+]
+
+ERROR_HANDLERS = [
+  (404, not_found_error),
+  (500, server_error),
+  (400, bad_request),
+  (401, unauthorized),
+  (403, forbidden),
+  (405, invalid_method),
+  (409, duplicate_resource),
+  (422, not_processable),
+]
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -423,11 +681,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
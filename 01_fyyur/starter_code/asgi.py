@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import create_app
+
+#----------------------------------------------------------------------------#
+# WSGI on ASGI.
+#----------------------------------------------------------------------------#
+
+# asgiref's WSGI runner, without the sync_to_async wrapper that puts every
+# request on one shared thread
+run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+
+def closing(wsgi_app):
+    # asgiref iterates the response but never calls its close(), which the
+    # profiling middleware and Werkzeug's ClosingIterator rely on
+    def application(environ, start_response):
+        body = wsgi_app(environ, start_response)
+        try:
+            for chunk in body:
+                yield chunk
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+    return application
+
+
+class PooledInstance(WsgiToAsgiInstance):
+
+    def __init__(self, wsgi_application, executor):
+        super(PooledInstance, self).__init__(wsgi_application)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(run_wsgi_app, thread_sensitive=False, executor=self.executor)(self, body)
+
+
+class ASGIAdapter(WsgiToAsgi):
+    # serves the WSGI app to ASGI servers through asgiref. The pinned
+    # SQLAlchemy 1.3 has no async engine, so views block on the database as
+    # they do under WSGI: requests are read on the event loop and then run on
+    # a pool of `workers` threads, the same cap as a threaded WSGI worker.
+
+    def __init__(self, wsgi_app, workers):
+        super(ASGIAdapter, self).__init__(closing(wsgi_app))
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asgi-view')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await PooledInstance(self.wsgi_application, self.executor)(scope, receive, send)
+        else:
+            raise ValueError('Unsupported ASGI scope: {}'.format(scope['type']))
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # running views finish on their own; the loop must not wait
+                # for them, as they may be waiting for it to send their body
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+#----------------------------------------------------------------------------#
+# Entry point.
+#----------------------------------------------------------------------------#
+
+def worker_threads(app):
+    return app.config.get('ASGI_WORKER_THREADS') or \
+        app.config['DATABASE_POOL_SIZE'] + app.config['DATABASE_MAX_OVERFLOW']
+
+def create_asgi_app(config=None):
+    # e.g. uvicorn --factory asgi:create_asgi_app --workers 2
+    app = create_app(config)
+    return ASGIAdapter(app, worker_threads(app))
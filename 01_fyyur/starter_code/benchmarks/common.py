@@ -0,0 +1,73 @@
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+DEFAULT_DATABASE_URL = 'sqlite:////tmp/fyyur-benchmark.db'
+
+def load_app(database_url=None, scratch=False):
+    # scratch: the benchmark writes (seeds, resets or submits forms), so it
+    # never falls back to DATABASE_URL, only to the throwaway SQLite file
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from app import create_app
+    if not database_url:
+        database_url = DEFAULT_DATABASE_URL if scratch else os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'WTF_CSRF_ENABLED': False
+    })
+    # per-request log lines would dominate the timings
+    app.logger.setLevel(logging.ERROR)
+    return app
+
+def percentile(values, fraction):
+    # nearest rank on a sorted list
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(math.ceil(fraction * len(values))) - 1))]
+
+def summarize(durations):
+    # durations in seconds; the summary is in milliseconds
+    durations = sorted(durations)
+    if not durations:
+        return {'runs': 0}
+    return {
+        'runs': len(durations),
+        'mean_ms': sum(durations) / len(durations) * 1000,
+        'min_ms': durations[0] * 1000,
+        'p50_ms': percentile(durations, 0.50) * 1000,
+        'p95_ms': percentile(durations, 0.95) * 1000,
+        'p99_ms': percentile(durations, 0.99) * 1000,
+        'max_ms': durations[-1] * 1000
+    }
+
+def metadata(app=None):
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    meta = {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+    if app is not None:
+        meta['database'] = app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0]
+    return meta
+
+def write_report(report, output=None):
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as handle:
+            handle.write(text + '\n')
+    else:
+        print(text)
@@ -0,0 +1,47 @@
+import argparse
+import json
+import sys
+
+def _timings(report):
+    # flattens micro and load reports into {name: summary}
+    timings = {}
+    for name, modes in report.get('views', {}).items():
+        for mode, summary in modes.items():
+            timings['{} ({})'.format(name, mode)] = summary
+    timings.update(report.get('components', {}))
+    timings.update(report.get('routes', {}))
+    if 'total' in report:
+        timings['total'] = report['total']
+    return timings
+
+def compare(old, new, metric='p50_ms', threshold=0.10):
+    # [(name, old, new, relative change)] for every timing present in both,
+    # and whether any of them got slower by more than threshold
+    old_timings, new_timings = _timings(old), _timings(new)
+    rows = []
+    regressed = False
+    for name in sorted(set(old_timings) & set(new_timings)):
+        before, after = old_timings[name].get(metric), new_timings[name].get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        regressed = regressed or change > threshold
+        rows.append((name, before, after, change))
+    return rows, regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff two benchmark reports.')
+    parser.add_argument('old', type=argparse.FileType('r'))
+    parser.add_argument('new', type=argparse.FileType('r'))
+    parser.add_argument('--metric', default='p50_ms')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Percent slowdown that counts as a regression.')
+    args = parser.parse_args()
+
+    rows, regressed = compare(json.load(args.old), json.load(args.new), args.metric, args.threshold / 100.0)
+    for name, before, after, change in rows:
+        flag = ' <-- slower' if change > args.threshold / 100.0 else ''
+        print('{:<40} {:>10.3f} {:>10.3f} {:>+8.1f}%{}'.format(name, before, after, change * 100, flag))
+    sys.exit(1 if regressed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from benchmarks.common import load_app, metadata, summarize, write_report
+
+# (route, weight, method, path, form data): roughly the read-heavy traffic the
+# site sees; {venue} and {artist} are drawn from the seeded ids on each request
+MIX = [
+    ('index', 10, 'GET', '/', None),
+    ('venues', 10, 'GET', '/venues', None),
+    ('show_venue', 20, 'GET', '/venues/{venue}', None),
+    ('artists', 10, 'GET', '/artists', None),
+    ('show_artist', 20, 'GET', '/artists/{artist}', None),
+    ('shows', 10, 'GET', '/shows', None),
+    ('search_venues', 5, 'POST', '/venues/search', {'search_term': 'music'}),
+    ('search_artists', 5, 'POST', '/artists/search', {'search_term': 'band'}),
+    ('venue_calendar', 5, 'GET', '/venues/{venue}/calendar', None),
+    ('api.shows', 5, 'GET', '/api/v1/shows', None),
+]
+
+class InProcessClient(object):
+    # drives the WSGI app directly, without sockets
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data):
+        response = self.client.open(path, method=method, data=data)
+        response.get_data()
+        return response.status_code
+
+
+class HTTPClient(object):
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data):
+        body = urlencode(data).encode('utf-8') if data else None
+        try:
+            with urlopen(Request(self.base_url + path, data=body, method=method), timeout=30) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+        except URLError:
+            return 599
+
+def run(make_client, venue_ids, artist_ids, duration, concurrency, seed=0):
+    # each worker picks routes by weight until the time is up; returns
+    # (route -> latencies, route -> error count, elapsed seconds)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    weights = [weight for _, weight, _, _, _ in MIX]
+    deadline = time.monotonic() + duration
+
+    def worker(number):
+        rng = random.Random(seed * 1000 + number)
+        client = make_client()
+        local_latencies = defaultdict(list)
+        local_errors = defaultdict(int)
+        while time.monotonic() < deadline:
+            name, _, method, path, data = rng.choices(MIX, weights)[0]
+            path = path.format(venue=rng.choice(venue_ids), artist=rng.choice(artist_ids))
+            started = time.perf_counter()
+            status = client.request(method, path, data)
+            local_latencies[name].append(time.perf_counter() - started)
+            if status >= 400:
+                local_errors[name] += 1
+        with lock:
+            for name, values in local_latencies.items():
+                latencies[name].extend(values)
+            for name, count in local_errors.items():
+                errors[name] += count
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.monotonic() - started
+
+def report(latencies, errors, elapsed):
+    routes = {}
+    everything = []
+    for name, values in sorted(latencies.items()):
+        routes[name] = summarize(values)
+        routes[name]['errors'] = errors.get(name, 0)
+        routes[name]['requests_per_second'] = len(values) / elapsed
+        everything.extend(values)
+    total = summarize(everything)
+    total['errors'] = sum(errors.values())
+    total['requests_per_second'] = len(everything) / elapsed
+    return {'elapsed_seconds': elapsed, 'routes': routes, 'total': total}
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive a mixed read load against Fyyur and report latency percentiles.')
+    parser.add_argument('--database-url', help='Defaults to DATABASE_URL, then a SQLite file in /tmp.')
+    parser.add_argument('--url', help='Base URL of a running server; the app is driven in-process when omitted.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run.')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', '-o', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args()
+
+    # the database is still read directly to pick ids that exist
+    app = load_app(args.database_url)
+    from models import db, Venue, Artist
+    with app.app_context():
+        venue_ids = [row[0] for row in db.session.query(Venue.id)]
+        artist_ids = [row[0] for row in db.session.query(Artist.id)]
+    if not venue_ids or not artist_ids:
+        parser.error('the database is empty; run benchmarks.seed first')
+
+    if args.url:
+        make_client = lambda: HTTPClient(args.url)
+    else:
+        make_client = lambda: InProcessClient(app)
+    latencies, errors, elapsed = run(make_client, venue_ids, artist_ids, args.duration, args.concurrency, args.seed)
+    result = report(latencies, errors, elapsed)
+    result['meta'] = metadata(app)
+    result['meta'].update({'target': args.url or 'in-process', 'concurrency': args.concurrency})
+    write_report(result, args.output)
+
+if __name__ == '__main__':
+    main()
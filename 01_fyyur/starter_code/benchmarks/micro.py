@@ -0,0 +1,270 @@
+import argparse
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import load_app, metadata, summarize, write_report
+
+# (name, method, path, form data); {venue} and {artist} are filled with seeded ids
+VIEWS = [
+    ('index', 'GET', '/', None),
+    ('venues', 'GET', '/venues', None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'music'}),
+    ('show_venue', 'GET', '/venues/{venue}', None),
+    ('venue_calendar', 'GET', '/venues/{venue}/calendar', None),
+    ('edit_venue', 'GET', '/venues/{venue}/edit', None),
+    ('create_venue_form', 'GET', '/venues/create', None),
+    ('artists', 'GET', '/artists', None),
+    ('search_artists', 'POST', '/artists/search', {'search_term': 'band'}),
+    ('show_artist', 'GET', '/artists/{artist}', None),
+    ('artist_calendar', 'GET', '/artists/{artist}/calendar', None),
+    ('edit_artist', 'GET', '/artists/{artist}/edit', None),
+    ('create_artist_form', 'GET', '/artists/create', None),
+    ('shows', 'GET', '/shows', None),
+    ('create_shows', 'GET', '/shows/create', None),
+    ('export_venues', 'GET', '/export/venues.jsonl', None),
+    ('healthz', 'GET', '/healthz', None),
+    ('cache_stats', 'GET', '/cache/stats', None),
+    ('api.venues', 'GET', '/api/v1/venues', None),
+    ('api.venue', 'GET', '/api/v1/venues/{venue}', None),
+    ('api.artist', 'GET', '/api/v1/artists/{artist}', None),
+    ('api.shows', 'GET', '/api/v1/shows', None),
+    ('api.venue_free', 'GET', '/api/v1/venues/{venue}/free?start={today}&end={next_week}', None),
+    ('api.search_entities', 'GET', '/api/v1/search/venues?q=music', None),
+]
+
+VENUE_FORM = {
+    'name': 'Benchmark Hall', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Benchmark Way',
+    'phone': '415-555-0100', 'genres': ['Jazz', 'Folk'], 'facebook_link': 'https://www.facebook.com/benchmarkhall'
+}
+ARTIST_FORM = {
+    'name': 'The Benchmark Trio', 'city': 'San Francisco', 'state': 'CA', 'phone': '415-555-0101',
+    'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/benchmarktrio'
+}
+# shows sent to /shows/batch per call
+BATCH_SIZE = 10
+
+def _time(function, runs, before=None):
+    durations = []
+    for _ in range(runs):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+def bench_views(app, venue_id, artist_id, runs, only=None):
+    # each view is timed warm (whatever the app caches hold after a first call)
+    # and cold (page and fragment caches cleared before every call)
+    from cache import cache, fragments
+
+    def clear():
+        cache.state(app).backend.clear()
+        fragments.state(app).backend.clear()
+    client = app.test_client()
+    today = datetime.utcnow().replace(microsecond=0)
+    values = {'venue': venue_id, 'artist': artist_id, 'today': today.isoformat(),
+              'next_week': (today + timedelta(days=7)).isoformat()}
+    results = {}
+    for name, method, path, data in VIEWS:
+        if only and name not in only:
+            continue
+        url = path.format(**values)
+
+        def call():
+            response = client.open(url, method=method, data=data)
+            response.get_data()
+            if response.status_code >= 400:
+                raise RuntimeError('{} {} returned {}'.format(method, url, response.status_code))
+
+        call()
+        results[name] = {
+            'warm': summarize(_time(call, runs)),
+            'cold': summarize(_time(call, runs, clear))
+        }
+    return results
+
+def bench_submissions(app, venue_id, artist_id, runs, only=None):
+    # every write view, one fresh submission per call; what a call needs (a
+    # free time slot, a venue to delete) is made before its timer starts. Run
+    # against a scratch catalog only: the submissions are committed.
+    from sqlalchemy import func
+    from bulk import FORM_TIME_FORMAT
+    from models import db, Show, Venue
+
+    client = app.test_client()
+    with app.app_context():
+        latest = db.session.query(func.max(Show.start_time)).scalar()
+    # slots after every existing show, so no booking conflicts
+    first = max(latest or datetime.utcnow(), datetime.utcnow()).replace(microsecond=0) + timedelta(days=1)
+    numbers = itertools.count()
+
+    def slot():
+        return first + timedelta(hours=6 * next(numbers))
+
+    def scratch_venue():
+        with app.app_context():
+            venue = Venue(name='Benchmark Scratch Venue', city='San Francisco', state='CA')
+            db.session.add(venue)
+            db.session.commit()
+            return venue.id
+
+    def show(start):
+        return {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start}
+
+    submissions = [
+        ('create_venue_submission', lambda: ('POST', '/venues/create', {'data': VENUE_FORM})),
+        ('edit_venue_submission', lambda: ('POST', '/venues/{}/edit'.format(venue_id), {'data': VENUE_FORM})),
+        ('create_artist_submission', lambda: ('POST', '/artists/create', {'data': ARTIST_FORM})),
+        ('edit_artist_submission', lambda: ('POST', '/artists/{}/edit'.format(artist_id), {'data': ARTIST_FORM})),
+        ('create_show_submission', lambda: (
+            'POST', '/shows/create', {'data': show(slot().strftime(FORM_TIME_FORMAT))})),
+        ('create_shows_batch', lambda: (
+            'POST', '/shows/batch', {'json': {'shows': [show(slot().isoformat()) for _ in range(BATCH_SIZE)]}})),
+        ('delete_venue', lambda: ('DELETE', '/venues/{}'.format(scratch_venue()), {})),
+    ]
+    results = {}
+    for name, make in submissions:
+        if only and name not in only:
+            continue
+        pending = []
+
+        def prepare():
+            pending.append(make())
+
+        def call():
+            method, url, body = pending.pop()
+            response = client.open(url, method=method, **body)
+            response.get_data()
+            if response.status_code >= 400:
+                raise RuntimeError('{} {} returned {}'.format(method, url, response.status_code))
+
+        results[name] = summarize(_time(call, runs, prepare))
+    return results
+
+def bench_components(app, runs):
+    # pieces shared by several views, timed on their own
+    import babel.dates
+    from app import format_datetime, _format_datetime
+    from models import db, Venue
+    from queries import search, venue_detail
+
+    results = {}
+    value = datetime(2026, 5, 21, 21, 30)
+    results['datetime_filter.cached'] = summarize(_time(lambda: format_datetime(value, 'full'), runs * 10))
+    results['datetime_filter.uncached'] = summarize(_time(
+        lambda: (_format_datetime.cache_clear(), format_datetime(value, 'full')), runs * 10))
+    results['datetime_filter.babel'] = summarize(_time(
+        lambda: babel.dates.format_datetime(value, "EEEE MMMM, d, y 'at' h:mma", locale='en'), runs * 10))
+    with app.app_context():
+        venue_id = db.session.query(Venue.id).order_by(Venue.id).first()[0]
+        results['query.venue_detail'] = summarize(_time(lambda: venue_detail(venue_id), runs))
+        results['query.search'] = summarize(_time(lambda: search(Venue, 'music'), runs))
+        # the plain substring match search replaced, for comparison
+        results['query.search_ilike'] = summarize(_time(lambda: db.session.query(Venue.id, Venue.name).filter(
+            Venue.name.ilike('%music%')).all(), runs))
+    return results
+
+def page_shows(tiles, seed=0):
+    # a /shows page worth of rows; shows start at a few evening hours, so
+    # timestamps repeat across the page the way they do on the real listing
+    rng = random.Random(seed)
+    first = datetime(2026, 5, 1)
+    rows = []
+    for index in range(tiles):
+        artist_id, venue_id = rng.randrange(500), rng.randrange(100)
+        rows.append({
+            'id': index,
+            'artist_id': artist_id,
+            'artist_name': 'Artist {}'.format(artist_id),
+            'artist_image_link': 'https://example.com/artists/{}.jpg'.format(artist_id),
+            'venue_id': venue_id,
+            'venue_name': 'Venue {}'.format(venue_id),
+            'venue_image_link': 'https://example.com/venues/{}.jpg'.format(venue_id),
+            'start_time': first + timedelta(days=rng.randrange(180), hours=rng.choice((19, 20, 21, 22)))
+        })
+    return rows
+
+def original_format_datetime(value, format='medium'):
+    # the datetime filter before it was memoized, for comparison
+    import babel.dates
+    import dateutil.parser
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(value, format)
+
+def bench_shows_page(app, runs, tiles=10000):
+    # the datetime filter on a /shows page of `tiles` shows, with the filter as
+    # it was before memoization and as it is now: the filter calls alone, and
+    # the whole page rendered with the fragment cache bypassed so every tile
+    # goes through the filter
+    from app import format_datetime, _format_datetime
+    from cache import fragments, NullCache
+    from queries import KeysetPage
+
+    rows = page_shows(tiles)
+    results = {}
+    state = fragments.state(app)
+    backend, state.backend = state.backend, NullCache()
+    try:
+        for name, function in (('before', original_format_datetime), ('after', format_datetime)):
+            _format_datetime.cache_clear()
+            calls = summarize(_time(lambda: [function(row['start_time'], 'full') for row in rows], runs))
+            calls['per_call_us'] = calls['mean_ms'] * 1000 / tiles
+            results['filter.' + name] = calls
+            # a private environment, so the filter swap cannot leak into the app
+            environment = app.jinja_env.overlay(cache_size=0)
+            environment.filters = dict(environment.filters, datetime=function)
+            with app.test_request_context('/shows'):
+                template = environment.get_template('pages/shows.html')
+
+                def render():
+                    context = {'shows': KeysetPage(rows, tiles, None), 'limit': tiles}
+                    app.update_template_context(context)
+                    return template.render(context)
+                results['render.' + name] = summarize(_time(render, runs))
+    finally:
+        state.backend = backend
+    results['speedup'] = results['render.before']['mean_ms'] / results['render.after']['mean_ms']
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Time every Fyyur view against a seeded catalog.')
+    parser.add_argument('--database-url', help='A scratch database; defaults to a SQLite file in /tmp, never '
+                        'to DATABASE_URL, as the write views commit to it.')
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--seed-venues', type=int, default=0,
+                        help='Seed a fresh catalog with this many venues (and 2x artists, 20x shows) first.')
+    parser.add_argument('--view', action='append', help='Only time these views.')
+    parser.add_argument('--tiles', type=int, default=10000, help='Shows on the page timed by shows_page.')
+    parser.add_argument('--output', '-o', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args()
+
+    app = load_app(args.database_url, scratch=True)
+    from models import db, Venue, Artist
+    from benchmarks.seed import prepare_database, seed_catalog
+    with app.app_context():
+        if args.seed_venues:
+            prepare_database(db, reset=True)
+            seed_catalog(args.seed_venues, args.seed_venues * 2, args.seed_venues * 20)
+        venue = db.session.query(Venue.id).order_by(Venue.id).first()
+        artist = db.session.query(Artist.id).order_by(Artist.id).first()
+        if venue is None or artist is None:
+            parser.error('the database is empty; run benchmarks.seed or pass --seed-venues')
+    write_report({
+        'meta': metadata(app),
+        'runs': args.runs,
+        'views': bench_views(app, venue[0], artist[0], args.runs, args.view),
+        'submissions': bench_submissions(app, venue[0], artist[0], args.runs, args.view),
+        'components': bench_components(app, args.runs) if not args.view else {},
+        'shows_page': bench_shows_page(app, max(1, args.runs // 10), args.tiles) if not args.view else {}
+    }, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import load_app
+
+CITIES = [('New York', 'NY'), ('San Francisco', 'CA'), ('Austin', 'TX'), ('Chicago', 'IL'),
+          ('Seattle', 'WA'), ('Nashville', 'TN'), ('New Orleans', 'LA'), ('Boston', 'MA')]
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop',
+          'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B',
+          'Reggae', 'Rock n Roll', 'Soul', 'Other']
+WORDS = ['Musical', 'Hop', 'Park', 'Square', 'Live', 'Dueling', 'Pianos', 'Wild', 'Sax', 'Band',
+         'Guns', 'Petals', 'Blue', 'Note', 'Velvet', 'Room', 'Echo', 'Garden', 'Neon', 'Harbor']
+# shows start this far apart, longer than SHOW_DURATION_MINUTES, so the
+# generated calendar never double-books a venue or an artist
+SHOW_SPACING = timedelta(hours=3)
+
+def _name(rng, index):
+    return '{} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), index)
+
+def generate(venues, artists, shows, seed=0, today=None):
+    # the same arguments always give the same rows; half of the shows are in
+    # the past and half upcoming, relative to `today`
+    rng = random.Random(seed)
+    today = datetime.combine(today or date.today(), datetime.min.time())
+    venue_rows = []
+    for index in range(venues):
+        city, state = rng.choice(CITIES)
+        venue_rows.append({
+            'name': 'The ' + _name(rng, index),
+            'city': city,
+            'state': state,
+            'address': '{} {} Street'.format(rng.randint(1, 9999), rng.choice(WORDS)),
+            'phone': '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            'genres': rng.sample(GENRES, rng.randint(1, 4)),
+            'image_link': 'https://example.com/venues/{}.jpg'.format(index),
+            'facebook_link': 'https://www.facebook.com/venue{}'.format(index),
+            'website': 'https://venue{}.example.com'.format(index),
+            'seeking_talent': rng.random() < 0.5,
+            'seeking_description': 'Looking for local acts.',
+            'created_date': today - timedelta(minutes=venues - index)
+        })
+    artist_rows = []
+    for index in range(artists):
+        city, state = rng.choice(CITIES)
+        artist_rows.append({
+            'name': _name(rng, index),
+            'city': city,
+            'state': state,
+            'phone': '{:03d}-{:03d}-{:04d}'.format(rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+            'genres': rng.sample(GENRES, rng.randint(1, 3)),
+            'image_link': 'https://example.com/artists/{}.jpg'.format(index),
+            'facebook_link': 'https://www.facebook.com/artist{}'.format(index),
+            'website': 'https://artist{}.example.com'.format(index),
+            'seeking_venue': rng.random() < 0.5,
+            'seeking_description': 'Looking for shows.',
+            'created_date': today - timedelta(minutes=artists - index)
+        })
+    first_show = today - SHOW_SPACING * (shows // 2)
+    show_rows = []
+    for index in range(shows):
+        start_time = first_show + SHOW_SPACING * index
+        show_rows.append({
+            # positions, resolved to ids once the venues and artists exist
+            'venue_id': rng.randrange(venues),
+            'artist_id': rng.randrange(artists),
+            'start_time': start_time,
+            'end_time': start_time + timedelta(hours=2)
+        })
+    return venue_rows, artist_rows, show_rows
+
+def seed_catalog(venues=100, artists=200, shows=2000, seed=0, batch_size=1000):
+    # inserts the generated catalog through the bulk import's writer, which
+    # keeps the show counters and calendar buckets in step
+    from bulk import batched, write_batch
+    from cache import cache
+    from models import db, Venue, Artist, Show
+
+    venue_rows, artist_rows, show_rows = generate(venues, artists, shows, seed)
+    for model, rows in ((Venue, venue_rows), (Artist, artist_rows)):
+        for batch in batched(rows, batch_size):
+            write_batch(model, batch)
+    venue_ids = [row[0] for row in db.session.query(Venue.id).order_by(Venue.id.desc()).limit(venues)][::-1]
+    artist_ids = [row[0] for row in db.session.query(Artist.id).order_by(Artist.id.desc()).limit(artists)][::-1]
+    for row in show_rows:
+        row['venue_id'] = venue_ids[row['venue_id']]
+        row['artist_id'] = artist_ids[row['artist_id']]
+    for batch in batched(show_rows, batch_size):
+        write_batch(Show, batch)
+    cache.clear()
+    return venue_ids, artist_ids
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a deterministic Fyyur catalog.')
+    parser.add_argument('--database-url', help='Defaults to a SQLite file in /tmp, never to DATABASE_URL.')
+    parser.add_argument('--venues', type=int, default=100)
+    parser.add_argument('--artists', type=int, default=200)
+    parser.add_argument('--shows', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reset', action='store_true', help='Drop and recreate the tables first (SQLite only).')
+    args = parser.parse_args()
+
+    app = load_app(args.database_url, scratch=True)
+    from models import db
+    with app.app_context():
+        prepare_database(db, args.reset)
+        started = time.monotonic()
+        seed_catalog(args.venues, args.artists, args.shows, args.seed)
+        print('Seeded {} venues, {} artists and {} shows in {:.1f}s'.format(
+            args.venues, args.artists, args.shows, time.monotonic() - started))
+
+def prepare_database(db, reset=False):
+    # PostgreSQL databases are expected to be migrated with `flask db upgrade`;
+    # SQLite ones are created from the models
+    if db.engine.dialect.name != 'sqlite':
+        return
+    if reset:
+        db.drop_all()
+    db.create_all()
+
+if __name__ == '__main__':
+    main()
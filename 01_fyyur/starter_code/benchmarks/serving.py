@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import io
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from benchmarks.common import load_app, metadata, write_report
+from benchmarks.load import MIX, report
+
+# the same request mix, `concurrency` requests in flight, served either by a
+# pool of WSGI worker threads or by the ASGI entry point in one process. Both
+# get the same number of threads, so only the serving layer differs.
+
+def _scope(method, path, data):
+    path, _, query = path.partition('?')
+    body = urlencode(data).encode('utf-8') if data else b''
+    headers = [(b'host', b'localhost')]
+    if data:
+        headers += [(b'content-type', b'application/x-www-form-urlencoded'),
+                    (b'content-length', str(len(body)).encode())]
+    return {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'query_string': query.encode(), 'root_path': '', 'headers': headers,
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 0)
+    }, body
+
+async def _asgi_request(application, scope, body):
+    status = []
+    sent = [False]
+
+    async def receive():
+        if sent[0]:
+            return {'type': 'http.disconnect'}
+        sent[0] = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+def _environ(scope, body):
+    server = scope['server']
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope['root_path'],
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope['http_version'],
+        'REMOTE_ADDR': scope['client'][0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope['scheme'],
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + name
+        environ[key] = value.decode('latin-1')
+    return environ
+
+def _wsgi_request(application, scope, body):
+    status = []
+
+    def start_response(line, headers, exc_info=None):
+        status.append(int(line.split(' ', 1)[0]))
+
+    response = application(_environ(scope, body), start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return status[0]
+
+async def drive(call, venue_ids, artist_ids, duration, concurrency, seed=0):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    weights = [weight for _, weight, _, _, _ in MIX]
+    deadline = time.monotonic() + duration
+
+    async def client(number):
+        rng = random.Random(seed * 1000 + number)
+        while time.monotonic() < deadline:
+            name, _, method, path, data = rng.choices(MIX, weights)[0]
+            scope, body = _scope(method, path.format(venue=rng.choice(venue_ids), artist=rng.choice(artist_ids)), data)
+            started = time.perf_counter()
+            status = await call(scope, body)
+            latencies[name].append(time.perf_counter() - started)
+            if status >= 400:
+                errors[name] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*[client(number) for number in range(concurrency)])
+    return latencies, errors, time.monotonic() - started
+
+def simulate_latency(seconds):
+    # every statement also waits `seconds`, like a round trip to a remote database
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def wait(*args):
+        time.sleep(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare WSGI and ASGI throughput under concurrent load.')
+    parser.add_argument('--database-url', help='Defaults to DATABASE_URL, then a SQLite file in /tmp.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mode.')
+    parser.add_argument('--concurrency', type=int, default=100, help='Requests in flight.')
+    parser.add_argument('--threads', type=int,
+                        help='Threads serving each mode; defaults to the ASGI entry point\'s ASGI_WORKER_THREADS.')
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help='Added to every statement.')
+    parser.add_argument('--output', '-o', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args()
+
+    app = load_app(args.database_url)
+    from asgi import ASGIAdapter, worker_threads
+    from models import db, Venue, Artist
+    with app.app_context():
+        venue_ids = [row[0] for row in db.session.query(Venue.id)]
+        artist_ids = [row[0] for row in db.session.query(Artist.id)]
+    if not venue_ids or not artist_ids:
+        parser.error('the database is empty; run benchmarks.seed first')
+    if args.db_latency_ms:
+        simulate_latency(args.db_latency_ms / 1000.0)
+
+    threads = args.threads or worker_threads(app)
+    wsgi_pool = ThreadPoolExecutor(max_workers=threads)
+
+    async def wsgi_call(scope, body):
+        return await asyncio.get_running_loop().run_in_executor(wsgi_pool, _wsgi_request, app, scope, body)
+
+    application = ASGIAdapter(app, threads)
+
+    async def asgi_call(scope, body):
+        return await _asgi_request(application, scope, body)
+
+    result = {'meta': metadata(app)}
+    result['meta'].update({
+        'concurrency': args.concurrency,
+        'threads': threads,
+        'db_latency_ms': args.db_latency_ms
+    })
+    for mode, call in (('wsgi', wsgi_call), ('asgi', asgi_call)):
+        result[mode] = report(*asyncio.run(drive(call, venue_ids, artist_ids, args.duration, args.concurrency)))
+    result['asgi_relative_throughput'] = result['asgi']['total']['requests_per_second'] / \
+        result['wsgi']['total']['requests_per_second']
+    wsgi_pool.shutdown()
+    application.executor.shutdown()
+    write_report(result, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import DEFAULT_DATABASE_URL, ROOT, load_app, metadata, summarize, write_report
+
+# runs in a fresh interpreter, like a newly forked or recycled worker
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+created = time.perf_counter()
+response = application.test_client().get(sys.argv[2])
+response.get_data()
+answered = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': answered - created,
+    'status': response.status_code,
+    'modules': len(sys.modules),
+    'loaded': sorted(name for name in ('alembic', 'babel.dates', 'dateutil.parser', 'flask_migrate') if name in sys.modules)
+}))
+'''
+
+def measure(database_url, path, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', CHILD, database_url, path], cwd=ROOT)
+        samples.append(json.loads(output.decode().strip().splitlines()[-1]))
+    report = {}
+    for phase in ('import', 'create_app', 'first_request'):
+        report[phase] = summarize([sample[phase] for sample in samples])
+    report['total'] = summarize([sample['import'] + sample['create_app'] + sample['first_request'] for sample in samples])
+    report['status'] = samples[-1]['status']
+    report['modules'] = samples[-1]['modules']
+    report['heavy_modules_loaded'] = samples[-1]['loaded']
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Time importing Fyyur, building the app and serving its first request.')
+    parser.add_argument('--database-url', help='Defaults to DATABASE_URL, then a SQLite file in /tmp.')
+    parser.add_argument('--path', default='/', help='Path of the first request.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--output', '-o', help='Write the JSON report here instead of stdout.')
+    args = parser.parse_args()
+
+    database_url = args.database_url or os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    app = load_app(database_url)
+    from models import db
+    from benchmarks.seed import prepare_database
+    with app.app_context():
+        prepare_database(db)
+    result = measure(database_url, args.path, args.runs)
+    result['meta'] = metadata(app)
+    write_report(result, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta, timezone
+
+from flask import current_app
+from models import db, Venue, Artist, Show
+from counters import shows_added
+
+#----------------------------------------------------------------------------#
+# Booking index.
+#----------------------------------------------------------------------------#
+
+class BookingIndex(object):
+    # [start, end) bookings per venue or artist, sorted by start, with the
+    # running maximum of their ends. Stored bookings may overlap each other
+    # (legacy rows on databases without the exclusion constraints), so a
+    # booking's own end says nothing about the ones before it; the running
+    # maximum does: the bookings starting before `end` overlap [start, end)
+    # exactly when their largest end is past `start`, found with a bisect.
+
+    def __init__(self):
+        self._starts = defaultdict(list)
+        self._ends = defaultdict(list)
+        self._reach = defaultdict(list)
+
+    def add(self, key, start, end):
+        position = bisect_right(self._starts[key], start)
+        reach = self._reach[key]
+        self._starts[key].insert(position, start)
+        self._ends[key].insert(position, end)
+        reach.insert(position, max(reach[position - 1], end) if position else end)
+        for later in range(position + 1, len(reach)):
+            if reach[later] >= end:
+                break
+            reach[later] = end
+
+    def conflict(self, key, start, end):
+        # a booking overlapping [start, end) as (start, end), or None
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        position = bisect_left(starts, end)
+        if not position or self._reach[key][position - 1] <= start:
+            return None
+        ends = self._ends[key]
+        while ends[position - 1] <= start:
+            position -= 1
+        return starts[position - 1], ends[position - 1]
+
+    def free(self, key, start, end):
+        # the free (start, end) windows between start and end
+        starts = self._starts.get(key, [])
+        ends = self._ends.get(key, [])
+        windows = []
+        cursor = start
+        # every booking before `first` has ended by `start`
+        first = bisect_right(self._reach.get(key, []), start)
+        for position in range(first, bisect_left(starts, end)):
+            if starts[position] > cursor:
+                windows.append((cursor, starts[position]))
+            cursor = max(cursor, ends[position])
+        if cursor < end:
+            windows.append((cursor, end))
+        return windows
+
+def show_duration():
+    return timedelta(minutes=current_app.config['SHOW_DURATION_MINUTES'])
+
+def max_show_duration():
+    return timedelta(minutes=current_app.config['MAX_SHOW_DURATION_MINUTES'])
+
+def load_bookings(key, ids, start, end):
+    # one range scan on the (venue_id|artist_id, start_time) index; no show is
+    # longer than MAX_SHOW_DURATION_MINUTES, which bounds how far back to look
+    index = BookingIndex()
+    if not ids:
+        return index
+    rows = db.session.query(key, Show.start_time, Show.end_time).filter(
+        key.in_(ids),
+        Show.start_time >= start - max_show_duration(),
+        Show.start_time < end
+    )
+    for entity_id, show_start, show_end in rows:
+        index.add(entity_id, show_start, show_end or show_start + show_duration())
+    return index
+
+def free_windows(venue_id, start, end):
+    return load_bookings(Show.venue_id, [venue_id], start, end).free(venue_id, start, end)
+
+#----------------------------------------------------------------------------#
+# Batched show creation.
+#----------------------------------------------------------------------------#
+
+def parse_time(value):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+    if value.tzinfo is not None:
+        # times are stored as naive UTC
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _parse(item):
+    # returns (row, errors) for one submitted show
+    errors = {}
+    row = {}
+    if not isinstance(item, dict):
+        return None, {'show': ['Expected an object.']}
+    for field in ('artist_id', 'venue_id'):
+        try:
+            row[field] = int(item.get(field))
+        except (TypeError, ValueError):
+            errors[field] = ['Expected an integer id.']
+    for field in ('start_time', 'end_time'):
+        if field == 'end_time' and not item.get(field):
+            continue
+        try:
+            row[field] = parse_time(item.get(field))
+        except (TypeError, ValueError, OverflowError):
+            errors[field] = ['Expected a date and time.']
+    if 'start_time' in row:
+        end_time = row.setdefault('end_time', row['start_time'] + show_duration())
+        if not row['start_time'] < end_time <= row['start_time'] + max_show_duration():
+            errors['end_time'] = ['Must be after the start time and at most {} minutes later.'.format(
+                current_app.config['MAX_SHOW_DURATION_MINUTES'])]
+    return row, errors
+
+def _existing_ids(model, ids):
+    return set(row[0] for row in db.session.query(model.id).filter(model.id.in_(ids)))
+
+def schedule_conflicts(rows):
+    # for each row, the errors of its overlapping venue or artist bookings, or
+    # None. Checked against the stored shows and the earlier rows in the list.
+    if not rows:
+        return []
+    start = min(row['start_time'] for row in rows)
+    end = max(row['end_time'] for row in rows)
+    venues = load_bookings(Show.venue_id, set(row['venue_id'] for row in rows), start, end)
+    artists = load_bookings(Show.artist_id, set(row['artist_id'] for row in rows), start, end)
+    conflicts = []
+    for row in rows:
+        errors = {}
+        if venues.conflict(row['venue_id'], row['start_time'], row['end_time']):
+            errors['venue_id'] = ['Venue is already booked at this time.']
+        if artists.conflict(row['artist_id'], row['start_time'], row['end_time']):
+            errors['artist_id'] = ['Artist is already booked at this time.']
+        if errors:
+            conflicts.append(errors)
+            continue
+        venues.add(row['venue_id'], row['start_time'], row['end_time'])
+        artists.add(row['artist_id'], row['start_time'], row['end_time'])
+        conflicts.append(None)
+    return conflicts
+
+def book_shows(items):
+    # validates and inserts a list of shows in one transaction; returns one
+    # result per item: created (with id), invalid or conflict
+    results = [None] * len(items)
+    parsed = []
+    for index, item in enumerate(items):
+        row, errors = _parse(item)
+        if errors:
+            results[index] = {'status': 'invalid', 'errors': errors}
+        else:
+            parsed.append((index, row))
+
+    artists = _existing_ids(Artist, set(row['artist_id'] for _, row in parsed))
+    venues = _existing_ids(Venue, set(row['venue_id'] for _, row in parsed))
+    resolved = []
+    for index, row in parsed:
+        errors = {}
+        if row['artist_id'] not in artists:
+            errors['artist_id'] = ['Unknown artist.']
+        if row['venue_id'] not in venues:
+            errors['venue_id'] = ['Unknown venue.']
+        if errors:
+            results[index] = {'status': 'invalid', 'errors': errors}
+        else:
+            resolved.append((index, row))
+
+    accepted = []
+    for (index, row), errors in zip(resolved, schedule_conflicts([row for _, row in resolved])):
+        if errors:
+            results[index] = {'status': 'conflict', 'errors': errors}
+        else:
+            accepted.append((index, row))
+
+    if accepted:
+        rows = [row for _, row in accepted]
+        for (index, _), show_id in zip(accepted, _insert(rows)):
+            results[index] = {'status': 'created', 'id': show_id}
+        shows_added((row['venue_id'], row['artist_id'], row['start_time'], row['end_time']) for row in rows)
+    db.session.commit()
+    return results, [row for _, row in accepted]
+
+def _insert(rows):
+    table = Show.__table__
+    if db.engine.dialect.implicit_returning:
+        # one multi-row INSERT ... RETURNING id
+        result = db.session.execute(table.insert().values(rows).returning(table.c.id))
+        return [row[0] for row in result]
+    return [db.session.execute(table.insert(), row).inserted_primary_key[0] for row in rows]
@@ -0,0 +1,286 @@
+import csv
+import json
+import os
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date
+from itertools import islice
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from werkzeug.datastructures import MultiDict
+
+from cache import cache
+from counters import shows_added
+from booking import schedule_conflicts, show_duration, max_show_duration, parse_time
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+
+ENTITIES = {
+    'venues': (Venue, VenueForm),
+    'artists': (Artist, ArtistForm),
+    'shows': (Show, ShowForm),
+}
+
+# the only layout ShowForm's DateTimeFields accept
+FORM_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+#----------------------------------------------------------------------------#
+# Pipeline stages.
+#----------------------------------------------------------------------------#
+
+def read_rows(stream, fmt):
+    # yields (line number, row) without reading the whole input
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), 2):
+            if row.get('genres'):
+                row['genres'] = row['genres'].split(';')
+            yield number, row
+    else:
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                yield number, json.loads(line)
+
+def normalize_times(rows):
+    # exports (and most clients) write ISO 8601 show times; they are parsed the
+    # way the batch endpoint parses them and handed to the form in its format.
+    # Unparseable values are left for the form to reject.
+    for number, row in rows:
+        for field in ('start_time', 'end_time'):
+            value = row.get(field)
+            if isinstance(value, str) and value.strip():
+                try:
+                    row[field] = parse_time(value).strftime(FORM_TIME_FORMAT)
+                except (ValueError, OverflowError):
+                    pass
+        yield number, row
+
+def validate_rows(rows, form_class, columns, reject):
+    # applies the same rules as the create forms; rejected rows go to reject()
+    for number, row in rows:
+        formdata = MultiDict()
+        for key, value in row.items():
+            for item in (value if isinstance(value, list) else [value]):
+                if isinstance(item, bool):
+                    item = 'y' if item else ''
+                formdata.add(key, '' if item is None else str(item))
+        form = form_class(formdata=formdata, meta={'csrf': False})
+        if form.validate():
+            yield number, {key: value for key, value in form.data.items() if key in columns}
+        else:
+            reject(number, form.errors)
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def resolve_shows(batch, reject):
+    # checks every artist and venue referenced by a batch with one IN query each
+    for _, row in batch:
+        row['artist_id'] = _as_id(row['artist_id'])
+        row['venue_id'] = _as_id(row['venue_id'])
+    artist_ids = set(row['artist_id'] for _, row in batch)
+    venue_ids = set(row['venue_id'] for _, row in batch)
+    known_artists = set(row[0] for row in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids)))
+    known_venues = set(row[0] for row in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids)))
+    resolved = []
+    for number, row in batch:
+        missing = {}
+        if row['artist_id'] not in known_artists:
+            missing['artist_id'] = ['Unknown artist.']
+        if row['venue_id'] not in known_venues:
+            missing['venue_id'] = ['Unknown venue.']
+        if missing:
+            reject(number, missing)
+        else:
+            resolved.append((number, row))
+    return _unbooked(resolved, reject)
+
+def _unbooked(batch, reject):
+    # fills in default end times and drops shows overlapping another booking
+    valid = []
+    for number, row in batch:
+        if not row.get('end_time'):
+            row['end_time'] = row['start_time'] + show_duration()
+        if row['start_time'] < row['end_time'] <= row['start_time'] + max_show_duration():
+            valid.append((number, row))
+        else:
+            reject(number, {'end_time': ['Must be after the start time and within the maximum show duration.']})
+    unbooked = []
+    for (number, row), errors in zip(valid, schedule_conflicts([row for _, row in valid])):
+        if errors:
+            reject(number, errors)
+        else:
+            unbooked.append((number, row))
+    return unbooked
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def write_batch(model, rows):
+    # a single executemany INSERT per batch
+    if rows:
+        db.session.execute(model.__table__.insert(), rows)
+        if model is Show:
+            shows_added((row['venue_id'], row['artist_id'], row['start_time'], row['end_time']) for row in rows)
+    db.session.commit()
+
+def import_rows(entity, stream, fmt='jsonl', batch_size=1000, reject=None, report=None):
+    # returns (imported, rejected); rejected rows are passed to reject(line, errors)
+    model, form_class = ENTITIES[entity]
+    columns = set(column.name for column in model.__table__.columns) - set(['id'])
+    rejected = [0]
+    imported = 0
+    started = time.monotonic()
+
+    def on_reject(number, messages):
+        rejected[0] += 1
+        if reject is not None:
+            reject(number, messages)
+
+    with current_app.test_request_context():
+        rows = read_rows(stream, fmt)
+        if model is Show:
+            rows = normalize_times(rows)
+        rows = validate_rows(rows, form_class, columns, on_reject)
+        for batch in batched(rows, batch_size):
+            if model is Show:
+                batch = resolve_shows(batch, on_reject)
+            write_batch(model, [row for _, row in batch])
+            imported += len(batch)
+            if report is not None:
+                report(imported, rejected[0], time.monotonic() - started)
+    cache.clear()
+    return imported, rejected[0]
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+@contextmanager
+def snapshot(engine=None):
+    # a read-only transaction that sees one consistent state of every table
+    connection = (engine or db.engine).connect()
+    postgresql = connection.dialect.name == 'postgresql'
+    if postgresql:
+        connection = connection.execution_options(isolation_level='REPEATABLE READ')
+    transaction = connection.begin()
+    if postgresql:
+        connection.execute('SET TRANSACTION READ ONLY')
+    try:
+        yield connection
+    finally:
+        transaction.rollback()
+        connection.close()
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+def export_lines(connection, entity, chunk_size=1000):
+    # server-side cursor, serialized row by row as the chunks arrive
+    table = ENTITIES[entity][0].__table__
+    result = connection.execution_options(stream_results=True).execute(
+        select([table]).order_by(table.c.id)
+    )
+    try:
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                return
+            for row in rows:
+                yield json.dumps(dict(row), default=_json_default) + '\n'
+    finally:
+        result.close()
+
+def gzip_chunks(lines):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for line in lines:
+        chunk = compressor.compress(line.encode('utf-8'))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+def stream_export(engine, entity, compress=False):
+    # for streamed responses: runs outside the app context, so it takes the
+    # engine, and the snapshot stays open until the body has been consumed
+    with snapshot(engine) as connection:
+        lines = export_lines(connection, entity)
+        if compress:
+            for chunk in gzip_chunks(lines):
+                yield chunk
+        else:
+            for line in lines:
+                yield line
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.command('import')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.argument('source', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'csv']), default=None,
+              help='Input format, guessed from the file extension by default.')
+@click.option('--batch-size', default=1000, show_default=True)
+@with_appcontext
+def import_command(entity, source, fmt, batch_size):
+    """Bulk import venues, artists or shows from a CSV or JSONL file."""
+    if fmt is None:
+        fmt = 'csv' if source.name.endswith('.csv') else 'jsonl'
+
+    def report(imported, rejected, elapsed):
+        click.echo('{} rows imported, {} rejected, {:.0f} rows/s'.format(
+            imported, rejected, imported / elapsed if elapsed else 0), err=True)
+
+    def reject(number, messages):
+        click.echo('line {}: {}'.format(number, json.dumps(messages)), err=True)
+
+    imported, rejected = import_rows(entity, source, fmt, batch_size, reject, report)
+    click.echo('Imported {} {}, rejected {}.'.format(imported, entity, rejected))
+    if rejected:
+        sys.exit(1)
+
+
+@click.command('export')
+@click.argument('entities', nargs=-1, type=click.Choice(sorted(ENTITIES)))
+@click.option('--output-dir', '-o', default='.', type=click.Path(file_okay=False),
+              help='Directory the <entity>.jsonl files are written to.')
+@click.option('--gzip', 'compress', is_flag=True, help='Write gzip-compressed files.')
+@with_appcontext
+def export_command(entities, output_dir, compress):
+    """Export venues, artists and shows as JSONL from a single snapshot."""
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    with snapshot() as connection:
+        for entity in entities or sorted(ENTITIES):
+            path = os.path.join(output_dir, entity + ('.jsonl.gz' if compress else '.jsonl'))
+            started = time.monotonic()
+            rows = [0]
+
+            def counted(lines):
+                for line in lines:
+                    rows[0] += 1
+                    yield line
+
+            lines = counted(export_lines(connection, entity))
+            with open(path, 'wb') as output:
+                if compress:
+                    output.writelines(gzip_chunks(lines))
+                else:
+                    output.writelines(line.encode('utf-8') for line in lines)
+            elapsed = time.monotonic() - started
+            click.echo('Exported {} {} to {} ({:.0f} rows/s)'.format(
+                rows[0], entity, path, rows[0] / elapsed if elapsed else 0))
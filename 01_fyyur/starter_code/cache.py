@@ -0,0 +1,207 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+class LRUCache(object):
+    # in-process cache: least recently used entries are dropped past maxsize,
+    # expired entries are dropped when they are next looked up. Invalidations
+    # only reach the process that makes them; other workers keep serving their
+    # copy until its TTL runs out.
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache(object):
+    # works with any client exposing redis-py's get/set(ex=)/delete/scan_iter,
+    # so tests can pass a local fake instead of a server connection
+
+    def __init__(self, client, prefix='fyyur:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        # only our own keys, the database may be shared with other applications
+        keys = []
+        for key in self.client.scan_iter(match=self.prefix + '*', count=1000):
+            keys.append(key)
+            if len(keys) == 1000:
+                self.client.delete(*keys)
+                keys = []
+        if keys:
+            self.client.delete(*keys)
+
+
+class NullCache(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+#----------------------------------------------------------------------------#
+# Cache.
+#----------------------------------------------------------------------------#
+
+class CacheState(object):
+    # one app's backend and hit counts
+
+    def __init__(self, backend, default_ttl=None):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+
+class Cache(object):
+    # the page cache, or with a namespace a separate cache of the same type
+    # (its own LRU, Redis key prefix, size and stats) configured by
+    # <NAMESPACE>_CACHE_* settings, so e.g. template fragments cannot evict pages.
+    # Each app keeps its own CacheState in app.extensions; outside an app
+    # context the one given to the constructor (a NullCache by default) is used.
+
+    def __init__(self, app=None, backend=None, namespace=None):
+        self.namespace = namespace
+        self.extension = 'cache' if namespace is None else namespace + '_cache'
+        self._default = CacheState(backend or NullCache())
+        if app is not None:
+            self.init_app(app)
+
+    def _setting(self, config, name, default=None):
+        if self.namespace is not None:
+            key = '{}_CACHE_{}'.format(self.namespace.upper(), name)
+            if key in config:
+                return config[key]
+        return config.get('CACHE_' + name, default)
+
+    def init_app(self, app, backend=None):
+        app.extensions[self.extension] = CacheState(backend or self._make_backend(app.config),
+                                                    self._setting(app.config, 'DEFAULT_TTL', 300))
+
+    def _make_backend(self, config):
+        cache_type = self._setting(config, 'TYPE', 'simple')
+        if cache_type == 'simple':
+            return LRUCache(self._setting(config, 'MAX_ENTRIES', 1024))
+        if cache_type == 'redis':
+            import redis
+            prefix = 'fyyur:' if self.namespace is None else 'fyyur:{}:'.format(self.namespace)
+            return RedisCache(redis.Redis.from_url(config['CACHE_REDIS_URL']), prefix)
+        if cache_type == 'null':
+            return NullCache()
+        raise ValueError('Unknown CACHE_TYPE: {}'.format(cache_type))
+
+    def state(self, app=None):
+        if app is None and has_app_context():
+            app = current_app
+        if app is not None:
+            return app.extensions.get(self.extension, self._default)
+        return self._default
+
+    @property
+    def backend(self):
+        return self.state().backend
+
+    def get_or_set(self, key, compute, ttl=None):
+        # None results (e.g. a missing venue) are never cached
+        state = self.state()
+        value = state.backend.get(key)
+        with state.lock:
+            if value is None:
+                state.misses += 1
+            else:
+                state.hits += 1
+        if value is None:
+            value = compute()
+            if value is not None:
+                state.backend.set(key, value, ttl or state.default_ttl)
+        return value
+
+    def invalidate(self, *keys):
+        self.backend.delete(*keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        state = self.state()
+        with state.lock:
+            total = state.hits + state.misses
+            return {
+                'backend': type(state.backend).__name__,
+                'hits': state.hits,
+                'misses': state.misses,
+                'hit_ratio': float(state.hits) / total if total else 0.0
+            }
+
+
+cache = Cache()
+fragments = Cache(namespace='fragment')
+
+def venue_key(venue_id, version=None):
+    # a versioned key (the page's ETag) is never invalidated: a write changes
+    # the version, so the old entry is no longer looked up and just expires
+    if version is None:
+        return 'venue:{}'.format(venue_id)
+    return 'venue:{}:{}'.format(venue_id, version)
+
+def artist_key(artist_id, version=None):
+    if version is None:
+        return 'artist:{}'.format(artist_id)
+    return 'artist:{}:{}'.format(artist_id, version)
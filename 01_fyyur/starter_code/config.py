@@ -14,4 +14,93 @@ DATABASE_NAME = "fyyur"
 username = 'postgres'
 password = '123456'
 url = 'localhost:5432'
-SQLALCHEMY_DATABASE_URI = "postgres://{}:{}@{}/{}".format(username, password, url, DATABASE_NAME)
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', "postgres://{}:{}@{}/{}".format(username, password, url, DATABASE_NAME))
+
+# Connection pool (PostgreSQL only, see pool.py). Connections are checked with
+# a ping before use and replaced after DATABASE_POOL_RECYCLE seconds, so a
+# database restart does not surface as errors on stale connections.
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+# seconds a request waits for a free connection before failing
+DATABASE_POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT', 10))
+DATABASE_POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+DATABASE_POOL_PRE_PING = os.environ.get('DATABASE_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+# milliseconds, 0 disables the server-side statement timeout
+DATABASE_STATEMENT_TIMEOUT = int(os.environ.get('DATABASE_STATEMENT_TIMEOUT', 30000))
+# psycopg2 batches executemany() calls (bulk import, counters) into few round trips
+DATABASE_EXECUTEMANY_MODE = os.environ.get('DATABASE_EXECUTEMANY_MODE', 'values')
+
+# Maximum number of ranked matches returned by the venue and artist search
+SEARCH_RESULTS_LIMIT = 50
+# Shorter search terms cannot use the trigram indexes; they get the first
+# SEARCH_RESULTS_LIMIT names containing them, unranked
+SEARCH_MIN_TERM_LENGTH = 3
+
+# Keyset pagination for the /shows and /artists listings
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Stream listing pages by default (can also be requested with ?stream=1)
+STREAM_LISTINGS = False
+
+# Cache for read-heavy pages: 'simple' (in-process LRU), 'redis' or 'null'.
+# 'simple' invalidates only within the process that made a change, so with
+# several workers the others serve stale pages for up to CACHE_DEFAULT_TTL
+# seconds; use 'redis' to share invalidations between workers.
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_DEFAULT_TTL = 300
+CACHE_MAX_ENTRIES = 1024
+
+# Largest number of shows accepted by POST /shows/batch
+MAX_BATCH_SHOWS = 500
+
+# Show durations used for double-booking checks
+SHOW_DURATION_MINUTES = 120
+MAX_SHOW_DURATION_MINUTES = 24 * 60
+
+# Months shown by the availability calendar, by default and at most; longer
+# ranges are a 400
+CALENDAR_MONTHS = 12
+MAX_CALENDAR_MONTHS = 24
+
+# SQL instrumentation (see instrumentation.py): statements slower than this are
+# logged with their parameter names and types (never the values), 0 disables
+# the slow-query log
+SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+# in debug mode, warn when one statement shape runs more often than this in a request
+SQL_N_PLUS_ONE_THRESHOLD = 5
+
+# Logging outside debug mode (see logs.py): JSON lines, rotated by size
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# records waiting for the writer thread; past 80% of it only LOG_SAMPLE_RATE of
+# the records below WARNING are kept, and a full queue drops records
+LOG_QUEUE_SIZE = 10000
+LOG_SAMPLE_RATE = 0.1
+
+# Request profiling (see profiling.py), off unless PROFILE_ENABLED is set.
+# Requests sent with "X-Profile: <PROFILE_TOKEN>" are profiled, as are a random
+# PROFILE_SAMPLE_RATE share of all requests; the newest PROFILE_KEEP profiles
+# are kept in PROFILE_DIR. The template share of a profile needs blinker for
+# Flask's render signals.
+PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/fyyur-profiles')
+PROFILE_KEEP = 100
+PROFILE_INTERVAL_MS = 5
+
+# Compiled templates are cached on disk, shared by all workers (see templating.py).
+# By default they go to Jinja's private per-user directory; a TEMPLATE_CACHE_DIR
+# must be owned by the app's user and not writable by anyone else.
+TEMPLATE_CACHE_ENABLED = os.environ.get('TEMPLATE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')
+# Rendered {% cache %} fragments live in their own cache of CACHE_TYPE, so the
+# many small tiles of a listing cannot evict page data
+FRAGMENT_CACHE_MAX_ENTRIES = 4096
+
+# Requests running at once, each on its own thread, under the ASGI entry point
+# (asgi.py); defaults to the database pool size plus overflow
+ASGI_WORKER_THREADS = int(os.environ.get('ASGI_WORKER_THREADS', 0))
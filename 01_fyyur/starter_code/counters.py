@@ -0,0 +1,199 @@
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, case, func
+
+from cache import cache
+from models import db, Venue, Artist, Show, VenueDay, ArtistDay
+
+# the denormalized upcoming_shows_count / past_shows_count columns, and the
+# show foreign key each of them is counted over
+COUNTED = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+# the per-day occupancy tables and the column holding their owner's id
+DAYS = ((VenueDay, 'venue_id'), (ArtistDay, 'artist_id'))
+
+def today():
+    return datetime.combine(date.today(), time())
+
+#----------------------------------------------------------------------------#
+# Incremental maintenance.
+#----------------------------------------------------------------------------#
+
+def shows_added(shows):
+    # shows: iterable of (venue_id, artist_id, start_time, end_time)
+    _apply(shows, 1)
+
+def shows_removed(shows):
+    _apply(shows, -1)
+
+def _apply(shows, sign):
+    cutoff = today()
+    deltas = {Venue: Counter(), Artist: Counter()}
+    day_deltas = {VenueDay: Counter(), ArtistDay: Counter()}
+    for venue_id, artist_id, start_time, end_time in shows:
+        kind = 'upcoming' if start_time is not None and start_time >= cutoff else 'past'
+        deltas[Venue][(int(venue_id), kind)] += sign
+        deltas[Artist][(int(artist_id), kind)] += sign
+        for day, minutes in show_days(start_time, end_time):
+            day_deltas[VenueDay][(int(venue_id), day, 'shows')] += sign
+            day_deltas[VenueDay][(int(venue_id), day, 'booked_minutes')] += sign * minutes
+            day_deltas[ArtistDay][(int(artist_id), day, 'shows')] += sign
+            day_deltas[ArtistDay][(int(artist_id), day, 'booked_minutes')] += sign * minutes
+    for model, delta in deltas.items():
+        rows = {}
+        for (entity_id, kind), amount in delta.items():
+            row = rows.setdefault(entity_id, {'_id': entity_id, '_upcoming': 0, '_past': 0})
+            row['_' + kind] += amount
+        if rows:
+            # one executemany UPDATE per table
+            table = model.__table__
+            db.session.execute(table.update().where(table.c.id == bindparam('_id')).values(
+                upcoming_shows_count=table.c.upcoming_shows_count + bindparam('_upcoming'),
+                past_shows_count=table.c.past_shows_count + bindparam('_past')
+            ), list(rows.values()))
+    for model, key in DAYS:
+        _apply_days(model, key, day_deltas[model], sign < 0)
+
+def show_days(start_time, end_time):
+    # the days a show occupies as (day, booked minutes on that day)
+    if start_time is None:
+        return []
+    if end_time is None or end_time <= start_time:
+        end_time = start_time + timedelta(minutes=current_app.config['SHOW_DURATION_MINUTES'])
+    days = []
+    day = start_time.date()
+    while datetime.combine(day, time()) < end_time:
+        day_start = datetime.combine(day, time())
+        overlap = min(end_time, day_start + timedelta(days=1)) - max(start_time, day_start)
+        days.append((day, int(overlap.total_seconds() // 60)))
+        day += timedelta(days=1)
+    return days
+
+def _apply_days(model, key, delta, removed):
+    rows = {}
+    for (entity_id, day, column), amount in delta.items():
+        row = rows.setdefault((entity_id, day), {'_id': entity_id, '_day': day, '_shows': 0, '_booked_minutes': 0})
+        row['_' + column] += amount
+    if not rows:
+        return
+    table = model.__table__
+    owner = table.c[key]
+    if db.engine.dialect.name == 'postgresql':
+        # one executemany upsert
+        from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values({key: bindparam('_id'), 'day': bindparam('_day'),
+                                          'shows': bindparam('_shows'), 'booked_minutes': bindparam('_booked_minutes')})
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[key, 'day'],
+            set_={'shows': table.c.shows + statement.excluded.shows,
+                  'booked_minutes': table.c.booked_minutes + statement.excluded.booked_minutes}
+        ), list(rows.values()))
+    else:
+        # look up which buckets exist with one range query, then one
+        # executemany UPDATE for those and one executemany INSERT for the rest
+        ids = set(entity_id for entity_id, _ in rows)
+        days = [day for _, day in rows]
+        existing = set(tuple(row) for row in db.session.query(owner, table.c.day).filter(
+            owner.in_(ids), table.c.day.between(min(days), max(days))))
+        updated = [row for bucket, row in rows.items() if bucket in existing]
+        created = [row for bucket, row in rows.items() if bucket not in existing]
+        if updated:
+            db.session.execute(table.update().where(and_(owner == bindparam('_id'), table.c.day == bindparam('_day'))).values(
+                shows=table.c.shows + bindparam('_shows'),
+                booked_minutes=table.c.booked_minutes + bindparam('_booked_minutes')
+            ), updated)
+        if created:
+            db.session.execute(table.insert(), [
+                {key: row['_id'], 'day': row['_day'], 'shows': row['_shows'], 'booked_minutes': row['_booked_minutes']}
+                for row in created])
+    if removed:
+        # a day without shows is free again
+        db.session.execute(table.delete().where(and_(
+            owner.in_(set(entity_id for entity_id, _ in rows)), table.c.shows <= 0)))
+
+def venue_shows(venue_id):
+    return db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time).filter(Show.venue_id == venue_id).all()
+
+#----------------------------------------------------------------------------#
+# Recount.
+#----------------------------------------------------------------------------#
+
+def actual_counts(model, key, ids=None):
+    cutoff = today()
+    query = db.session.query(
+        model.id,
+        model.upcoming_shows_count,
+        model.past_shows_count,
+        func.count(case([(Show.start_time >= cutoff, 1)])),
+        func.count(case([(Show.start_time < cutoff, 1)]))
+    ).outerjoin(Show, key == model.id).group_by(model.id)
+    if ids is not None:
+        query = query.filter(model.id.in_(ids))
+    return query
+
+def recount(model, key, ids=None):
+    # rewrites the counters from the Show table; returns the rows that drifted
+    # as (id, (stored upcoming, stored past), (actual upcoming, actual past))
+    drift = []
+    for entity_id, upcoming, past, actual_upcoming, actual_past in actual_counts(model, key, ids):
+        if (upcoming, past) != (actual_upcoming, actual_past):
+            drift.append((entity_id, (upcoming, past), (actual_upcoming, actual_past)))
+    if drift:
+        table = model.__table__
+        db.session.execute(table.update().where(table.c.id == bindparam('_id')).values(
+            upcoming_shows_count=bindparam('_upcoming'),
+            past_shows_count=bindparam('_past')
+        ), [{'_id': entity_id, '_upcoming': actual[0], '_past': actual[1]} for entity_id, _, actual in drift])
+    return drift
+
+def roll_forward(lookback=timedelta(days=7)):
+    # shows that started since the last midnights moved from upcoming to past;
+    # only their venues and artists are recounted, so this is cheap to run daily
+    cutoff = today()
+    recounted = 0
+    for model, key in COUNTED:
+        ids = [row[0] for row in db.session.query(key).filter(
+            Show.start_time >= cutoff - lookback, Show.start_time < cutoff
+        ).distinct()]
+        if ids:
+            recount(model, key, ids)
+            recounted += len(ids)
+    db.session.commit()
+    cache.invalidate('venues')
+    return recounted
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.command('roll-counters')
+@click.option('--days', default=7, show_default=True,
+              help='How far back to look for shows that became past shows.')
+@with_appcontext
+def roll_counters_command(days):
+    """Move shows that have started from the upcoming to the past counters."""
+    recounted = roll_forward(timedelta(days=days))
+    click.echo('Recounted {} venues and artists.'.format(recounted))
+
+@click.command('check-counters')
+@click.option('--dry-run', is_flag=True, help='Only report drift, do not rewrite the counters.')
+@with_appcontext
+def check_counters_command(dry_run):
+    """Rebuild every show counter from the Show table and report drift."""
+    drifted = 0
+    for model, key in COUNTED:
+        drift = recount(model, key)
+        drifted += len(drift)
+        for entity_id, stored, actual in drift:
+            click.echo('{} {}: stored upcoming/past {}/{}, actual {}/{}'.format(
+                model.__tablename__, entity_id, stored[0], stored[1], actual[0], actual[1]))
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        cache.invalidate('venues')
+    click.echo('{} counters drifted.'.format(drifted))
@@ -3,16 +3,28 @@ from fabric.contrib.console import confirm
 
 # prepare for deployment
 
+# the benchmarks seed, reset and write to this throwaway database, never to DATABASE_URL
+BENCHMARK_DATABASE_URL = "sqlite:////tmp/fyyur-bench.db"
+
 
 def test():
+    # the test suite, then every view once against a freshly seeded SQLite catalog
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m pytest -q tests && "
+            "python -m benchmarks.micro --database-url {} --seed-venues 20 --runs 1 -o /dev/null".format(
+                BENCHMARK_DATABASE_URL), capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def benchmark(output="benchmark.json"):
+    local("python -m benchmarks.seed --database-url {} --reset".format(BENCHMARK_DATABASE_URL))
+    local("python -m benchmarks.micro --database-url {} -o micro-{}".format(BENCHMARK_DATABASE_URL, output))
+    local("python -m benchmarks.load --database-url {} -o load-{}".format(BENCHMARK_DATABASE_URL, output))
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
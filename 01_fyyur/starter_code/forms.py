@@ -1,11 +1,11 @@
+import re
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, TextAreaField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, AnyOf, URL, Optional, ValidationError
 
 def validate_phone(self, phone):
     us_phone_num = '^([0-9]{3})[-][0-9]{3}[-][0-9]{4}$'
-    print(phone.data)
     match = re.search(us_phone_num, phone.data)
     if not match:
         raise ValidationError('Error, phone number must be in format xxx-xxx-xxxx')
@@ -21,6 +21,10 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()]
+    )
 
 class VenueForm(Form):
     name = StringField(
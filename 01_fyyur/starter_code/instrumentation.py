@@ -0,0 +1,156 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# collapses "IN (?, ?, ?)" / "VALUES (...), (...)" so statements that only
+# differ in the number of bound values share one shape
+_REPEATED_PLACEHOLDERS = re.compile(r'(\?|%\(\w+\)s|%s)(\s*,\s*(\?|%\(\w+\)s|%s))+')
+_REPEATED_ROWS = re.compile(r'(\([^()]*\))(\s*,\s*\([^()]*\))+')
+
+# the running request's RequestQueries is also kept in its WSGI environ, for
+# middleware that outlives the request context (see profiling.py)
+ENVIRON_KEY = 'fyyur.sql_queries'
+
+def statement_shape(statement):
+    shape = _REPEATED_PLACEHOLDERS.sub(r'\1, ...', statement)
+    shape = _REPEATED_ROWS.sub(r'\1, ...', shape)
+    return ' '.join(shape.split())
+
+def normalize_parameters(parameters, executemany=False):
+    # a log-safe rendering that shows the parameter names and value types but
+    # never the values, which may be personal data (search terms, phones);
+    # executemany batches are shown as their first row and size
+    if executemany:
+        rows = list(parameters)
+        if not rows:
+            return '[]'
+        return '[{} ... x{}]'.format(normalize_parameters(rows[0]), len(rows))
+    if isinstance(parameters, dict):
+        return '{' + ', '.join('{}: {}'.format(key, _type(value)) for key, value in sorted(parameters.items())) + '}'
+    if isinstance(parameters, (list, tuple)):
+        return '(' + ', '.join(_type(value) for value in parameters) + ')'
+    return _type(parameters)
+
+def _type(value):
+    return type(value).__name__
+
+#----------------------------------------------------------------------------#
+# Per-request statistics.
+#----------------------------------------------------------------------------#
+
+class RequestQueries(object):
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = None
+        self.slowest_duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        if duration >= self.slowest_duration:
+            self.slowest, self.slowest_duration = statement, duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def server_timing(self):
+        return 'db;dur={:.1f};desc="{} queries", app;dur={:.1f}'.format(
+            self.duration * 1000, self.count, (time.monotonic() - self.started) * 1000)
+
+
+class SQLSettings(object):
+    # one app's logger and thresholds
+
+    def __init__(self, app):
+        self.logger = logging.getLogger(app.logger.name + '.sql')
+        slow_ms = app.config.get('SLOW_QUERY_MS')
+        self.slow_threshold = slow_ms / 1000.0 if slow_ms else None
+        self.n_plus_one_threshold = None
+        if app.debug or app.config.get('SQL_DETECT_N_PLUS_ONE'):
+            self.n_plus_one_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+
+
+class SQLStats(object):
+    # records the statements run while handling each request. Engine events are
+    # registered once for every engine; outside of a request they only feed the
+    # slow-query log of the app in context.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not event.contains(Engine, 'before_cursor_execute', self._before_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['sql_stats'] = SQLSettings(app)
+
+    def current(self):
+        # the running request's RequestQueries, or None
+        if has_app_context():
+            return g.get('sql_queries')
+        return None
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # kept on the execution context, which is dropped with a failed
+        # statement; the few statements the dialect runs without one are not timed
+        if context is not None:
+            context._query_started = time.monotonic()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_started', None)
+        if started is None:
+            return
+        duration = time.monotonic() - started
+        if not has_app_context():
+            return
+        queries = g.get('sql_queries')
+        if queries is not None:
+            queries.record(statement, duration)
+        settings = current_app.extensions.get('sql_stats')
+        if settings is not None and settings.slow_threshold is not None and duration >= settings.slow_threshold:
+            settings.logger.warning('slow query %.1fms: %s %s', duration * 1000, ' '.join(statement.split()),
+                                normalize_parameters(parameters, executemany),
+                                extra={'duration_ms': duration * 1000})
+
+    def _start_request(self):
+        g.sql_queries = request.environ[ENVIRON_KEY] = RequestQueries()
+
+    def _finish_request(self, response):
+        # left in g: a streamed body keeps recording into it
+        queries = g.get('sql_queries')
+        if queries is None:
+            return response
+        settings = current_app.extensions['sql_stats']
+        response.headers.add('Server-Timing', queries.server_timing())
+        settings.logger.info('%s %s %d queries %.1fms db, slowest %.1fms', request.method, request.path,
+                         queries.count, queries.duration * 1000, queries.slowest_duration * 1000,
+                         extra={
+                             'method': request.method,
+                             'path': request.path,
+                             'status': response.status_code,
+                             'queries': queries.count,
+                             'db_ms': queries.duration * 1000,
+                             'slowest_ms': queries.slowest_duration * 1000,
+                             'slowest': queries.slowest
+                         })
+        if settings.n_plus_one_threshold is not None:
+            for shape, count in queries.repeated(settings.n_plus_one_threshold):
+                settings.logger.warning('possible N+1 in %s %s: %d x %s', request.method, request.path, count, shape,
+                                    extra={'path': request.path, 'repeated': count, 'statement': shape})
+        return response
+
+
+sql_stats = SQLStats()
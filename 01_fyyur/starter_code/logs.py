@@ -0,0 +1,158 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | set(['message', 'asctime', 'request_id'])
+
+#----------------------------------------------------------------------------#
+# Formatting.
+#----------------------------------------------------------------------------#
+
+class JSONFormatter(logging.Formatter):
+    # one JSON object per line, with the extra= fields merged in
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'module': record.module,
+            'line': record.lineno
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+_traceback_formatter = logging.Formatter()
+
+#----------------------------------------------------------------------------#
+# Non-blocking handler.
+#----------------------------------------------------------------------------#
+
+class SamplingQueueHandler(QueueHandler):
+    # never blocks the logging thread: past the high-water mark records below
+    # WARNING are sampled, and when the queue is full records are dropped. The
+    # number of dropped records is reported with the next record that fits.
+
+    def __init__(self, queue, sample_rate=0.1, high_water=0.8):
+        super(SamplingQueueHandler, self).__init__(queue)
+        self.sample_rate = sample_rate
+        self.high_water = int(queue.maxsize * high_water) if queue.maxsize else None
+        self.dropped = 0
+        self.listener = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, record):
+        if (self.high_water is not None and record.levelno < logging.WARNING
+                and self.queue.qsize() >= self.high_water and random.random() >= self.sample_rate):
+            self._drop()
+            return
+        with self._lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            record.dropped_before = dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._drop(dropped + 1)
+
+    def stop(self):
+        # flushes the queued records
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def _drop(self, count=1):
+        with self._lock:
+            self.dropped += count
+
+    def prepare(self, record):
+        # renders the message and traceback before the record leaves this
+        # thread, keeping them apart for the JSON formatter
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+#----------------------------------------------------------------------------#
+# Extension.
+#----------------------------------------------------------------------------#
+
+class Logs(object):
+    # JSON lines written by a background thread to a size-rotated file, and
+    # a request id (taken from X-Request-ID or generated) on every record.
+    # Apps share the `app` logger, so its handler and listener are only set
+    # up by the first app and reused by the rest.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.extensions['logs'] = None
+        if app.debug or not config.get('LOG_FILE'):
+            # keep Flask's default stderr handler during development
+            return
+        app.logger.setLevel(config.get('LOG_LEVEL', logging.INFO))
+        # Flask's stderr handler would write synchronously again
+        app.logger.removeHandler(default_handler)
+        for handler in app.logger.handlers:
+            if isinstance(handler, SamplingQueueHandler):
+                app.extensions['logs'] = handler
+                return
+        file_handler = RotatingFileHandler(config['LOG_FILE'], maxBytes=config.get('LOG_MAX_BYTES', 10 * 1024 * 1024),
+                                           backupCount=config.get('LOG_BACKUP_COUNT', 5), delay=True)
+        file_handler.setFormatter(JSONFormatter())
+        records = queue.Queue(maxsize=config.get('LOG_QUEUE_SIZE', 10000))
+        handler = SamplingQueueHandler(records, config.get('LOG_SAMPLE_RATE', 0.1))
+        handler.addFilter(RequestIdFilter())
+        handler.listener = QueueListener(records, file_handler, respect_handler_level=True)
+        app.logger.addHandler(handler)
+        handler.listener.start()
+        atexit.register(handler.stop)
+        app.extensions['logs'] = handler
+
+    def _start_request(self):
+        request_id = request.headers.get('X-Request-ID', '')[:64]
+        g.request_id = request_id or uuid.uuid4().hex
+
+    def _finish_request(self, response):
+        if g.get('request_id'):
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+
+logs = Logs()
@@ -0,0 +1,46 @@
+"""search indexes
+
+Revision ID: 3f9a2c71d4e8
+Revises: b87c727dd9a5
+Create Date: 2026-10-18 09:12:41.208114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a2c71d4e8'
+down_revision = 'b87c727dd9a5'
+branch_labels = None
+depends_on = None
+
+# must stay in sync with queries.search_document()
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple'::regconfig, "
+    "coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || "
+    "coalesce(state, '') || ' ' || coalesce(fyyur_genres_text(genres), ''))"
+)
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # array_to_string() is only STABLE, so wrap it to use it in an index expression
+    op.execute(
+        "CREATE OR REPLACE FUNCTION fyyur_genres_text(character varying[]) RETURNS text "
+        "LANGUAGE sql IMMUTABLE AS $$ SELECT array_to_string($1, ' ') $$"
+    )
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            'CREATE INDEX ix_{0}_name_trgm ON "{1}" USING gin (name gin_trgm_ops)'.format(table.lower(), table)
+        )
+        op.execute(
+            'CREATE INDEX ix_{0}_search ON "{1}" USING gin ({2})'.format(table.lower(), table, SEARCH_DOCUMENT)
+        )
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.execute('DROP INDEX IF EXISTS ix_{0}_search'.format(table.lower()))
+        op.execute('DROP INDEX IF EXISTS ix_{0}_name_trgm'.format(table.lower()))
+    op.execute('DROP FUNCTION IF EXISTS fyyur_genres_text(character varying[])')
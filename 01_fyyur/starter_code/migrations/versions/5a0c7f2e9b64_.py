@@ -0,0 +1,115 @@
+"""show end_time and overlap constraints
+
+Revision ID: 5a0c7f2e9b64
+Revises: e7b3d90c5a21
+Create Date: 2026-10-18 14:36:19.044217
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.env')
+
+
+# revision identifiers, used by Alembic.
+revision = '5a0c7f2e9b64'
+down_revision = 'e7b3d90c5a21'
+branch_labels = None
+depends_on = None
+
+# matches SHOW_DURATION_MINUTES in config.py
+DEFAULT_DURATION = "interval '120 minutes'"
+
+# shows overlapping an earlier booking, with the same semantics as the
+# exclusion constraints below
+OVERLAPPING = (
+    'SELECT s.id, s.venue_id, s.artist_id, s.start_time, s.end_time FROM "Show" s '
+    'WHERE EXISTS (SELECT 1 FROM "Show" o WHERE o.id <> s.id '
+    'AND (o.venue_id = s.venue_id OR o.artist_id = s.artist_id) '
+    'AND tsrange(o.start_time, o.end_time) && tsrange(s.start_time, s.end_time)) '
+    'ORDER BY s.id'
+)
+
+
+def _overlaps(first, second):
+    # tsrange(start, end) && tsrange(start, end), where NULL bounds are infinite
+    # and a range with start == end is empty
+    if first.start_time is not None and first.start_time == first.end_time:
+        return False
+    if second.start_time is not None and second.start_time == second.end_time:
+        return False
+    return (first.start_time is None or second.end_time is None or first.start_time < second.end_time) and \
+        (second.start_time is None or first.end_time is None or second.start_time < first.end_time)
+
+
+def _recount(key, ids):
+    table = 'Venue' if key == 'venue_id' else 'Artist'
+    op.get_bind().execute(sa.text(
+        'UPDATE "{0}" SET '
+        'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id '
+        'AND "Show".start_time >= current_date), '
+        'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id '
+        'AND "Show".start_time < current_date) '
+        'WHERE id IN :ids'.format(table, key)
+    ).bindparams(sa.bindparam('ids', expanding=True)), ids=list(ids))
+
+
+def set_aside_double_bookings():
+    # Existing double bookings would make the constraints fail. The earliest
+    # booked show (lowest id) of each clash stays; the shows clashing with a
+    # kept one move to "ShowConflict" for review, and the counters of their
+    # venues and artists are recounted.
+    connection = op.get_bind()
+    op.execute('CREATE TABLE "ShowConflict" (LIKE "Show")')
+    kept = []
+    moved = []
+    for show in connection.execute(sa.text(OVERLAPPING)):
+        if any((show.venue_id == other.venue_id or show.artist_id == other.artist_id) and _overlaps(show, other)
+               for other in kept):
+            moved.append(show)
+        else:
+            kept.append(show)
+    if not moved:
+        return
+    ids = sa.bindparam('ids', expanding=True)
+    connection.execute(sa.text('INSERT INTO "ShowConflict" SELECT * FROM "Show" WHERE id IN :ids').bindparams(ids),
+                       ids=[show.id for show in moved])
+    connection.execute(sa.text('DELETE FROM "Show" WHERE id IN :ids').bindparams(ids),
+                       ids=[show.id for show in moved])
+    _recount('venue_id', set(show.venue_id for show in moved))
+    _recount('artist_id', set(show.artist_id for show in moved))
+    logger.warning('Moved %d double-booked shows to "ShowConflict": %s',
+                   len(moved), ', '.join(str(show.id) for show in moved))
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "Show" SET end_time = start_time + {}'.format(DEFAULT_DURATION))
+    set_aside_double_bookings()
+    # btree_gist lets the integer ids take part in a GiST exclusion constraint,
+    # which also serves as the range index for overlap lookups
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        'ALTER TABLE "Show" ADD CONSTRAINT show_venue_no_overlap '
+        'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    )
+    op.execute(
+        'ALTER TABLE "Show" ADD CONSTRAINT show_artist_no_overlap '
+        'EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)'
+    )
+
+
+def downgrade():
+    op.execute('ALTER TABLE "Show" DROP CONSTRAINT IF EXISTS show_artist_no_overlap')
+    op.execute('ALTER TABLE "Show" DROP CONSTRAINT IF EXISTS show_venue_no_overlap')
+    # the set-aside double bookings are valid again without the constraints
+    connection = op.get_bind()
+    moved = connection.execute(sa.text('SELECT venue_id, artist_id FROM "ShowConflict"')).fetchall()
+    op.execute('INSERT INTO "Show" SELECT * FROM "ShowConflict"')
+    op.execute('DROP TABLE "ShowConflict"')
+    if moved:
+        _recount('venue_id', set(row.venue_id for row in moved))
+        _recount('artist_id', set(row.artist_id for row in moved))
+    op.drop_column('Show', 'end_time')
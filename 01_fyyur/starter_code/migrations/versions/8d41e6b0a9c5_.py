@@ -0,0 +1,32 @@
+"""show and listing indexes
+
+Revision ID: 8d41e6b0a9c5
+Revises: 3f9a2c71d4e8
+Create Date: 2026-10-18 10:02:17.553870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41e6b0a9c5'
+down_revision = '3f9a2c71d4e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_start_time', 'Show', ['start_time'], unique=False)
+    op.create_index('ix_venue_created_date', 'Venue', ['created_date'], unique=False)
+    op.create_index('ix_artist_created_date', 'Artist', ['created_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artist_created_date', table_name='Artist')
+    op.drop_index('ix_venue_created_date', table_name='Venue')
+    op.drop_index('ix_show_start_time', table_name='Show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
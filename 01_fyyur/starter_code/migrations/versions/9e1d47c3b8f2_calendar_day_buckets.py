@@ -0,0 +1,43 @@
+"""calendar day buckets
+
+Revision ID: 9e1d47c3b8f2
+Revises: 5a0c7f2e9b64
+Create Date: 2026-10-18 15:02:47.318560
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e1d47c3b8f2'
+down_revision = '5a0c7f2e9b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, owner, key in (('VenueDay', 'Venue', 'venue_id'), ('ArtistDay', 'Artist', 'artist_id')):
+        op.create_table(table,
+            sa.Column(key, sa.Integer(), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('shows', sa.Integer(), nullable=False),
+            sa.Column('booked_minutes', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint([key], ['{}.id'.format(owner)], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(key, 'day')
+        )
+        # every day each existing show overlaps, with the minutes it covers
+        op.execute(
+            'INSERT INTO "{0}" ({1}, day, shows, booked_minutes) '
+            'SELECT s.{1}, d::date, count(*), '
+            'sum(floor(extract(epoch FROM least(s.end_time, d + interval \'1 day\') - greatest(s.start_time, d)) / 60))::int '
+            'FROM "Show" s CROSS JOIN LATERAL generate_series('
+            'date_trunc(\'day\', s.start_time), s.end_time - interval \'1 microsecond\', interval \'1 day\') AS d '
+            'WHERE s.start_time IS NOT NULL AND s.end_time > s.start_time '
+            'GROUP BY s.{1}, d::date'.format(table, key)
+        )
+
+
+def downgrade():
+    op.drop_table('ArtistDay')
+    op.drop_table('VenueDay')
@@ -0,0 +1,34 @@
+"""nearest-neighbour name search
+
+Revision ID: a4c2e81f5d07
+Revises: 9e1d47c3b8f2
+Create Date: 2026-10-18 16:41:09.530412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c2e81f5d07'
+down_revision = '9e1d47c3b8f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a GiST trigram index serves both the name ILIKE filter and the
+    # `name <-> term` ordering, so search reads the k nearest names and stops
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            'CREATE INDEX ix_{0}_name_trgm_gist ON "{1}" USING gist (name gist_trgm_ops)'.format(table.lower(), table)
+        )
+        op.execute('DROP INDEX IF EXISTS ix_{0}_name_trgm'.format(table.lower()))
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            'CREATE INDEX ix_{0}_name_trgm ON "{1}" USING gin (name gin_trgm_ops)'.format(table.lower(), table)
+        )
+        op.execute('DROP INDEX IF EXISTS ix_{0}_name_trgm_gist'.format(table.lower()))
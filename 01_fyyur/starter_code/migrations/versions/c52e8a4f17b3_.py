@@ -0,0 +1,31 @@
+"""updated_at columns
+
+Revision ID: c52e8a4f17b3
+Revises: 8d41e6b0a9c5
+Create Date: 2026-10-18 11:47:05.310926
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52e8a4f17b3'
+down_revision = '8d41e6b0a9c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('Artist', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('Show', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "Venue" SET updated_at = coalesce(created_date, now())')
+    op.execute('UPDATE "Artist" SET updated_at = coalesce(created_date, now())')
+    op.execute('UPDATE "Show" SET updated_at = now()')
+
+
+def downgrade():
+    op.drop_column('Show', 'updated_at')
+    op.drop_column('Artist', 'updated_at')
+    op.drop_column('Venue', 'updated_at')
@@ -0,0 +1,35 @@
+"""show counters
+
+Revision ID: e7b3d90c5a21
+Revises: c52e8a4f17b3
+Create Date: 2026-10-18 13:20:52.871402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3d90c5a21'
+down_revision = 'c52e8a4f17b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.execute(
+            'UPDATE "{0}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id '
+            'AND "Show".start_time >= current_date), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{1} = "{0}".id '
+            'AND "Show".start_time < current_date)'.format(table, key)
+        )
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Pool.
+#----------------------------------------------------------------------------#
+
+class TimedQueuePool(QueuePool):
+    # a QueuePool that records how long requests wait for a connection
+
+    def __init__(self, *args, **kwargs):
+        super(TimedQueuePool, self).__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.monotonic()
+        timed_out = False
+        try:
+            return super(TimedQueuePool, self)._do_get()
+        except TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.monotonic() - started
+            with self._stats_lock:
+                self.waits += 1
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+                self.timeouts += timed_out
+
+    def wait_stats(self):
+        with self._stats_lock:
+            return {
+                'checkouts': self.waits,
+                'wait_seconds_total': self.wait_time,
+                'wait_seconds_max': self.max_wait,
+                'wait_seconds_avg': self.wait_time / self.waits if self.waits else 0.0,
+                'timeouts': self.timeouts
+            }
+
+#----------------------------------------------------------------------------#
+# Extension.
+#----------------------------------------------------------------------------#
+
+class Pool(object):
+    # turns the DATABASE_* settings into SQLALCHEMY_ENGINE_OPTIONS; call it
+    # before the engine is first used. SQLite keeps Flask-SQLAlchemy's defaults.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        # a copy, so apps built from one settings mapping keep their own options
+        options = config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() in ('postgresql', 'postgres'):
+            options.setdefault('poolclass', TimedQueuePool)
+            options.setdefault('pool_size', config.get('DATABASE_POOL_SIZE', 5))
+            options.setdefault('max_overflow', config.get('DATABASE_MAX_OVERFLOW', 10))
+            options.setdefault('pool_timeout', config.get('DATABASE_POOL_TIMEOUT', 30))
+            options.setdefault('pool_recycle', config.get('DATABASE_POOL_RECYCLE', -1))
+            options.setdefault('pool_pre_ping', config.get('DATABASE_POOL_PRE_PING', True))
+            if config.get('DATABASE_EXECUTEMANY_MODE'):
+                options.setdefault('executemany_mode', config['DATABASE_EXECUTEMANY_MODE'])
+            if config.get('DATABASE_STATEMENT_TIMEOUT'):
+                connect_args = options.setdefault('connect_args', {})
+                connect_args.setdefault('options', '-c statement_timeout={}'.format(config['DATABASE_STATEMENT_TIMEOUT']))
+        app.extensions['pool'] = self
+
+    def stats(self, engine):
+        pool = engine.pool
+        stats = {'class': type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            stats.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'idle': pool.checkedin(),
+                # negative while the pool has not opened pool_size connections yet
+                'overflow': max(pool.overflow(), 0)
+            })
+        if isinstance(pool, TimedQueuePool):
+            stats.update(pool.wait_stats())
+        return stats
+
+    def check(self, engine):
+        # (healthy, database round trip in seconds)
+        started = time.monotonic()
+        try:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+        except Exception:
+            return False, time.monotonic() - started
+        return True, time.monotonic() - started
+
+
+pool = Pool()
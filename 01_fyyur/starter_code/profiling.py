@@ -0,0 +1,281 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import before_render_template, has_request_context, request, template_rendered
+from flask.signals import signals_available
+
+from instrumentation import ENVIRON_KEY as SQL_QUERIES_KEY
+
+TIMES_KEY = 'fyyur.profile_times'
+
+#----------------------------------------------------------------------------#
+# Sampler.
+#----------------------------------------------------------------------------#
+
+class StackSampler(object):
+    # samples one thread's stack from a background thread, giving collapsed
+    # stacks for flame graphs
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler')
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append('{}:{}'.format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def collapsed(self):
+        # Brendan Gregg's folded format, one "frame;frame;frame count" per line
+        return ''.join('{} {}\n'.format(stack, count) for stack, count in self.stacks.most_common())
+
+    def samples(self):
+        return sum(self.stacks.values())
+
+#----------------------------------------------------------------------------#
+# Breakdown.
+#----------------------------------------------------------------------------#
+
+class RequestTimes(object):
+    # template time of one profiled request, measured between Flask's
+    # before_render_template and template_rendered signals. SQL run while
+    # rendering (streamed listings fetch rows as they go) is taken out, it is
+    # already counted as SQL.
+
+    def __init__(self, environ):
+        self.environ = environ
+        self.template = 0.0
+        self._renders = []
+
+    def _sql(self):
+        queries = self.environ.get(SQL_QUERIES_KEY)
+        return queries.duration if queries is not None else 0.0
+
+    def render_started(self):
+        self._renders.append((time.perf_counter(), self._sql()))
+
+    def render_finished(self):
+        if not self._renders:
+            return
+        started, sql = self._renders.pop()
+        # nested renders are part of the outermost one
+        if not self._renders:
+            self.template += time.perf_counter() - started - (self._sql() - sql)
+
+def _render_started(sender, template, context, **extra):
+    times = request.environ.get(TIMES_KEY) if has_request_context() else None
+    if times is not None:
+        times.render_started()
+
+def _render_finished(sender, template, context, **extra):
+    times = request.environ.get(TIMES_KEY) if has_request_context() else None
+    if times is not None:
+        times.render_finished()
+
+def breakdown(environ, wall):
+    # exact SQL time from the request's RequestQueries (see instrumentation.py),
+    # template time from the render signals, the remainder is Python. A part
+    # that could not be measured (no SQL instrumentation, or no blinker for
+    # the signals) is None and stays in the remainder.
+    queries = environ.get(SQL_QUERIES_KEY)
+    times = environ.get(TIMES_KEY)
+    sql = queries.duration if queries is not None else None
+    template = times.template if times is not None and signals_available else None
+    return {
+        'sql_ms': sql * 1000 if sql is not None else None,
+        'template_ms': template * 1000 if template is not None else None,
+        'python_ms': max(wall - (sql or 0.0) - (template or 0.0), 0.0) * 1000
+    }
+
+#----------------------------------------------------------------------------#
+# Storage.
+#----------------------------------------------------------------------------#
+
+class ProfileStore(object):
+    # a directory holding the newest `keep` profiles; older ones are deleted
+    # as new ones are written
+
+    def __init__(self, directory, keep=100):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, profile_id, summary, profiler, sampler):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        base = os.path.join(self.directory, profile_id)
+        profiler.dump_stats(base + '.pstats')
+        with open(base + '.collapsed', 'w') as output:
+            output.write(sampler.collapsed())
+        with open(base + '.json', 'w') as output:
+            json.dump(summary, output, indent=2)
+        self._trim()
+
+    def _trim(self):
+        with self._lock:
+            ids = sorted(set(name.rsplit('.', 1)[0] for name in os.listdir(self.directory)
+                             if name.endswith(('.json', '.pstats', '.collapsed'))))
+            for profile_id in ids[:-self.keep] if self.keep else ids:
+                for extension in ('.json', '.pstats', '.collapsed'):
+                    try:
+                        os.remove(os.path.join(self.directory, profile_id + extension))
+                    except OSError:
+                        pass
+
+    def list(self):
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json')) \
+            if os.path.isdir(self.directory) else []
+
+#----------------------------------------------------------------------------#
+# Middleware.
+#----------------------------------------------------------------------------#
+
+def _top_functions(profiler, limit=20):
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        'function': '{}:{}({})'.format(os.path.basename(filename), line, name),
+        'calls': calls,
+        'own_ms': own * 1000,
+        'cumulative_ms': cumulative * 1000
+    } for (filename, line, name), (_, calls, own, cumulative, _) in rows]
+
+
+class ProfilingMiddleware(object):
+    # profiles the requests carrying `X-Profile: <token>` and a random
+    # `sample_rate` share of the others, including the streaming of their body
+
+    def __init__(self, wsgi_app, store, token=None, sample_rate=0.0, interval=0.005):
+        self.wsgi_app = wsgi_app
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    def _wanted(self, environ):
+        header = environ.get('HTTP_X_PROFILE')
+        if header is not None and self.token and header == self.token:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, environ, start_response):
+        if not self._wanted(environ):
+            return self.wsgi_app(environ, start_response)
+
+        # sorts by time, which is what the store trims by
+        profile_id = '{}-{}'.format(datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'), uuid.uuid4().hex[:8])
+        status = []
+
+        def profiled_start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+            headers = list(headers) + [('X-Profile-Id', profile_id)]
+            return start_response(status_line, headers, exc_info)
+
+        environ[TIMES_KEY] = RequestTimes(environ)
+        started = time.perf_counter()
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profiler = cProfile.Profile()
+        sampler.start()
+        profiler.enable()
+        try:
+            body = self.wsgi_app(environ, profiled_start_response)
+        except Exception:
+            profiler.disable()
+            sampler.stop()
+            raise
+
+        def finish():
+            profiler.disable()
+            sampler.stop()
+            wall = time.perf_counter() - started
+            summary = {
+                'id': profile_id,
+                'method': environ.get('REQUEST_METHOD'),
+                'path': environ.get('PATH_INFO'),
+                'query': environ.get('QUERY_STRING'),
+                'status': status[0] if status else None,
+                'wall_ms': wall * 1000,
+                'samples': sampler.samples(),
+                'breakdown': breakdown(environ, wall),
+                'top': _top_functions(profiler)
+            }
+            self.store.save(profile_id, summary, profiler, sampler)
+
+        return ProfiledBody(body, finish)
+
+
+class ProfiledBody(object):
+    # keeps profiling while the server iterates a streamed body
+
+    def __init__(self, body, on_close):
+        self.body = body
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self.on_close()
+
+#----------------------------------------------------------------------------#
+# Extension.
+#----------------------------------------------------------------------------#
+
+class Profiler(object):
+    # wraps app.wsgi_app only when PROFILE_ENABLED is set, so a disabled
+    # profiler adds nothing to the request path. The app's ProfileStore is
+    # kept in app.extensions['profiler'].
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        if not config.get('PROFILE_ENABLED'):
+            return
+        store = ProfileStore(config.get('PROFILE_DIR', 'profiles'), config.get('PROFILE_KEEP', 100))
+        if signals_available:
+            before_render_template.connect(_render_started, app)
+            template_rendered.connect(_render_finished, app)
+        app.wsgi_app = ProfilingMiddleware(
+            app.wsgi_app,
+            store,
+            token=config.get('PROFILE_TOKEN'),
+            sample_rate=config.get('PROFILE_SAMPLE_RATE', 0.0),
+            interval=config.get('PROFILE_INTERVAL_MS', 5) / 1000.0
+        )
+        app.extensions['profiler'] = store
+
+
+profiler = Profiler()
@@ -0,0 +1,408 @@
+import calendar
+import heapq
+import operator
+from collections import namedtuple
+from datetime import date, datetime, time
+from flask import current_app
+from sqlalchemy import func, or_, and_, literal_column
+from models import db, Venue, Artist, Show, VenueDay, ArtistDay
+
+#----------------------------------------------------------------------------#
+# Home.
+#----------------------------------------------------------------------------#
+
+def recently_listed(model, limit=10):
+    rows = db.session.query(model.id, model.name).order_by(model.created_date.desc()).limit(limit).all()
+    return [{'id': row.id, 'name': row.name} for row in rows]
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+def venue_areas():
+    # one single-table query for every venue and its upcoming show count,
+    # ordered so the areas can be grouped in a single pass.
+    rows = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).order_by(Venue.state, Venue.city, Venue.id).all()
+
+    areas = []
+    area = None
+    for row in rows:
+        if area is None or (area['city'], area['state']) != (row.city, row.state):
+            area = {'city': row.city, 'state': row.state, 'venues': []}
+            areas.append(area)
+        area['venues'].append({
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows
+        })
+    return areas
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+def _detail_columns(model):
+    # the stored counters are left out, the page counts its shows itself
+    return [column for column in model.__table__.columns
+            if column.name not in ('upcoming_shows_count', 'past_shows_count')]
+
+def _detail_view(name, model):
+    columns = [column.name for column in _detail_columns(model)]
+    return namedtuple(name, columns + ['upcoming_shows', 'past_shows', 'upcoming_shows_count', 'past_shows_count'])
+
+VenueDetail = _detail_view('VenueDetail', Venue)
+ArtistDetail = _detail_view('ArtistDetail', Artist)
+VenueShow = namedtuple('VenueShow', ['artist_id', 'artist_name', 'artist_image_link', 'start_time'])
+ArtistShow = namedtuple('ArtistShow', ['venue_id', 'venue_name', 'venue_image_link', 'start_time'])
+
+def venue_detail(venue_id):
+    return _load_detail(Venue, venue_id, Show.venue_id, Artist, Show.artist_id, VenueDetail, VenueShow)
+
+def artist_detail(artist_id):
+    return _load_detail(Artist, artist_id, Show.artist_id, Venue, Show.venue_id, ArtistDetail, ArtistShow)
+
+def _load_detail(model, entity_id, own_key, other, other_key, view, show):
+    # the entity and all of its shows in one round trip, returned as a read-only
+    # view so nothing gets attached to the session-bound model instance
+    columns = _detail_columns(model)
+    rows = db.session.query(
+        *columns,
+        other.id, other.name, other.image_link, Show.start_time
+    ).outerjoin(Show, own_key == model.id).outerjoin(other, other.id == other_key).filter(
+        model.id == entity_id
+    ).order_by(Show.start_time).all()
+    if not rows:
+        return None
+
+    today = datetime.combine(date.today(), time())
+    upcoming_shows = []
+    past_shows = []
+    width = len(columns)
+    for row in rows:
+        start_time = row[-1]
+        if start_time is None:
+            continue
+        target = upcoming_shows if start_time >= today else past_shows
+        target.append(show._make(row[width:]))
+    return view(
+        *rows[0][:width],
+        upcoming_shows=tuple(upcoming_shows),
+        past_shows=tuple(past_shows),
+        upcoming_shows_count=len(upcoming_shows),
+        past_shows_count=len(past_shows)
+    )
+
+def partner_ids(own_key, other_key, entity_id):
+    # ids on the other side of the shows of one venue or artist
+    rows = db.session.query(other_key).filter(own_key == entity_id).distinct().all()
+    return [row[0] for row in rows]
+
+def venue_version(venue_id):
+    return _page_version(Venue, venue_id, Show.venue_id, Artist, Show.artist_id)
+
+def artist_version(artist_id):
+    return _page_version(Artist, artist_id, Show.artist_id, Venue, Show.venue_id)
+
+def _page_version(model, entity_id, own_key, other, other_key):
+    # a cheap aggregate that changes whenever anything rendered on the detail
+    # page does, as (version tuple, last modified); None if the entity is missing
+    row = db.session.query(
+        model.updated_at,
+        func.count(Show.id),
+        func.max(Show.id),
+        func.max(Show.updated_at),
+        func.max(other.updated_at)
+    ).outerjoin(Show, own_key == model.id).outerjoin(other, other.id == other_key).filter(
+        model.id == entity_id
+    ).group_by(model.id).first()
+    if row is None:
+        return None
+    # shows move from upcoming to past at midnight without any write
+    today = datetime.combine(date.today(), time())
+    last_modified = max([stamp for stamp in (row[0], row[3], row[4]) if stamp] + [today])
+    return tuple(row) + (today,), last_modified
+
+#----------------------------------------------------------------------------#
+# Availability calendar.
+#----------------------------------------------------------------------------#
+
+CalendarDay = namedtuple('CalendarDay', ['day', 'shows', 'booked_minutes'])
+
+def venue_occupancy(venue_id, start, end):
+    return _occupancy(VenueDay, VenueDay.venue_id, venue_id, start, end)
+
+def artist_occupancy(artist_id, start, end):
+    return _occupancy(ArtistDay, ArtistDay.artist_id, artist_id, start, end)
+
+def _occupancy(model, key, entity_id, start, end):
+    # booked days in [start, end) from one primary key range scan; days
+    # without a row are free
+    rows = db.session.query(model.day, model.shows, model.booked_minutes).filter(
+        key == entity_id, model.day >= start, model.day < end
+    ).order_by(model.day)
+    return dict((row.day, CalendarDay(*row)) for row in rows)
+
+def month_span(year, month, months):
+    # first day of the given month and of the month `months` later
+    index = year * 12 + month - 1 + months
+    return date(year, month, 1), date(index // 12, index % 12 + 1, 1)
+
+def calendar_range(start=None, months=None):
+    # (start, end) days for ?start=YYYY-MM&months=N, from the current month by
+    # default; raises ValueError for a malformed start month or a range
+    # outside 1..MAX_CALENDAR_MONTHS
+    config = current_app.config
+    months = int(months) if months is not None else config['CALENDAR_MONTHS']
+    if not 1 <= months <= config['MAX_CALENDAR_MONTHS']:
+        raise ValueError('Expected 1 to {} months.'.format(config['MAX_CALENDAR_MONTHS']))
+    if start:
+        first = datetime.strptime(start, '%Y-%m')
+    else:
+        first = date.today()
+    return month_span(first.year, first.month, months)
+
+def calendar_months(start, end, occupancy):
+    # [(first day of month, weeks)] for rendering; each week holds seven
+    # CalendarDay, or None for padding days outside the month
+    months = []
+    weeks = calendar.Calendar()
+    first = start
+    while first < end:
+        rows = []
+        for week in weeks.monthdatescalendar(first.year, first.month):
+            rows.append([
+                occupancy.get(day, CalendarDay(day, 0, 0)) if day.month == first.month else None
+                for day in week
+            ])
+        months.append((first, rows))
+        first = month_span(first.year, first.month, 1)[1]
+    return months
+
+#----------------------------------------------------------------------------#
+# Listings.
+#----------------------------------------------------------------------------#
+
+class InvalidCursor(ValueError):
+    pass
+
+class KeysetPage(object):
+    # one page of a keyset-paginated listing. Rows are consumed lazily so the
+    # page can be streamed; next_cursor and prev_cursor are known once
+    # iteration has finished. A page read backwards (before a cursor) comes
+    # from the database in reverse and is turned round here.
+
+    def __init__(self, rows, limit, cursor_of, backward=False, previous=False):
+        # previous: whether a forward page has rows before it (it was read after a cursor)
+        self._rows = rows
+        self._limit = limit
+        self._cursor_of = cursor_of
+        self._backward = backward
+        self._previous = previous
+        self.next_cursor = None
+        self.prev_cursor = None
+
+    def __iter__(self):
+        if self._backward:
+            rows = list(self._rows)
+            more = len(rows) > self._limit
+            rows = rows[:self._limit][::-1]
+            if rows:
+                # the cursor this page was read before is on the next page
+                self.next_cursor = self._cursor_of(rows[-1])
+                if more:
+                    self.prev_cursor = self._cursor_of(rows[0])
+            for row in rows:
+                yield row
+            return
+        last = None
+        for count, row in enumerate(self._rows):
+            if count == self._limit:
+                # the extra row only tells us there is another page
+                self.next_cursor = self._cursor_of(last)
+                break
+            if count == 0 and self._previous:
+                self.prev_cursor = self._cursor_of(row)
+            last = row
+            yield row
+
+    def freeze(self):
+        # a fully materialized, picklable copy that can be stored in the cache
+        rows = [row._asdict() for row in self]
+        page = KeysetPage(rows, self._limit, None)
+        page.next_cursor = self.next_cursor
+        page.prev_cursor = self.prev_cursor
+        return page
+
+CURSOR_TIME_FORMAT = '%Y%m%dT%H%M%S.%f'
+
+def _show_cursor(row):
+    return '{}_{}'.format(row.start_time.strftime(CURSOR_TIME_FORMAT), row.id)
+
+def _parse_show_cursor(cursor):
+    try:
+        start_time, show_id = cursor.split('_')
+        return datetime.strptime(start_time, CURSOR_TIME_FORMAT), _parse_id_cursor(show_id)
+    except ValueError:
+        raise InvalidCursor(cursor)
+
+# ids past a 64-bit integer cannot be compared in the database
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+def _parse_id_cursor(cursor):
+    try:
+        entity_id = int(cursor)
+    except ValueError:
+        raise InvalidCursor(cursor)
+    if not 0 <= entity_id <= MAX_CURSOR_ID:
+        raise InvalidCursor(cursor)
+    return entity_id
+
+def _fetch(query, limit, stream):
+    # fetch one row past the page size to find out whether there is another page
+    query = query.limit(limit + 1)
+    if stream:
+        return query.yield_per(min(limit + 1, 100))
+    return query.all()
+
+def _show_columns():
+    return [
+        Show.id,
+        Show.artist_id.label('artist_id'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.venue_id.label('venue_id'),
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Show.start_time
+    ]
+
+SHOW_FIELDS = [column.key for column in _show_columns()]
+
+def _beyond(key, values, compare):
+    # (k1, k2) > (v1, v2) spelled out, so the index on k1 can serve it
+    if len(key) == 1:
+        return compare(key[0], values[0])
+    return or_(compare(key[0], values[0]), and_(key[0] == values[0], _beyond(key[1:], values[1:], compare)))
+
+def _keyset(query, key, after, before, parse):
+    # rows after or before a cursor over the `key` columns, in key order;
+    # rows before a cursor are read last first
+    if after and before:
+        raise InvalidCursor(before)
+    if after:
+        query = query.filter(_beyond(key, parse(after), operator.gt))
+    elif before:
+        query = query.filter(_beyond(key, parse(before), operator.lt))
+    return query.order_by(*[column.desc() for column in key] if before else key)
+
+def shows_page(after=None, limit=50, stream=False, fields=None, before=None):
+    # fields limits the selected columns; id and start_time are always
+    # selected, the cursor is made of them
+    columns = [column for column in _show_columns()
+               if fields is None or column.key in fields or column.key in ('id', 'start_time')]
+    query = db.session.query(*columns).select_from(Show).join(Venue).join(Artist).filter(
+        Show.start_time.isnot(None))
+    query = _keyset(query, [Show.start_time, Show.id], after, before, _parse_show_cursor)
+    return KeysetPage(_fetch(query, limit, stream and not before), limit, _show_cursor,
+                      backward=bool(before), previous=bool(after))
+
+def entity_page(model, after=None, limit=50, stream=False, fields=None, before=None):
+    # keyset page of venues or artists by id; fields limits the selected columns
+    columns = [model.id] + [getattr(model, field) for field in fields or ['name'] if field != 'id']
+    query = _keyset(db.session.query(*columns), [model.id], after, before, lambda cursor: (_parse_id_cursor(cursor),))
+    return KeysetPage(_fetch(query, limit, stream and not before), limit, _id_cursor,
+                      backward=bool(before), previous=bool(after))
+
+def _id_cursor(row):
+    return str(row.id)
+
+def artists_page(after=None, limit=50, stream=False, before=None):
+    return entity_page(Artist, after, limit, stream, before=before)
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def search_document(model):
+    # must match the ix_*_search expression indexes in migration 3f9a2c71d4e8
+    text = literal_column("' '")
+    return func.to_tsvector(
+        literal_column("'simple'::regconfig"),
+        func.coalesce(model.name, '') + text +
+        func.coalesce(model.city, '') + text +
+        func.coalesce(model.state, '') + text +
+        func.coalesce(func.fyyur_genres_text(model.genres), '')
+    )
+
+def search(model, term, limit=None):
+    # ranked top-k matches with their upcoming show counts, as (id, name, num_upcoming_shows);
+    # terms shorter than a trigram cannot use the indexes and get plain name matches
+    if limit is None:
+        limit = current_app.config.get('SEARCH_RESULTS_LIMIT', 50)
+    term = term.strip()
+    if len(term) < current_app.config.get('SEARCH_MIN_TERM_LENGTH', 3):
+        return _search_short(model, term, limit)
+    if db.engine.dialect.name == 'postgresql':
+        return _search_indexed(model, term, limit)
+    return _search_in_process(model, term, limit)
+
+def _search_short(model, term, limit):
+    # the first `limit` names containing the term, in id order, so the scan
+    # along the primary key stops as soon as enough rows match
+    rows = db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows')
+    ).filter(model.name.ilike('%' + term + '%')).order_by(model.id).limit(limit)
+    return [row._asdict() for row in rows]
+
+def _search_indexed(model, term, limit):
+    # each candidate set is cut off at `limit` inside its index before anything
+    # is ranked: name matches come nearest first from the GiST trigram index,
+    # document matches straight from the tsvector index. Only those (at most
+    # 2 * limit) rows are ranked.
+    document = search_document(model)
+    tsquery = func.plainto_tsquery(literal_column("'simple'::regconfig"), term)
+    by_name = db.session.query(model.id.label('id')).filter(
+        model.name.ilike('%' + term + '%')
+    ).order_by(model.name.op('<->')(term)).limit(limit)
+    by_document = db.session.query(model.id.label('id')).filter(document.op('@@')(tsquery)).limit(limit)
+    candidates = by_name.union(by_document).subquery()
+    rank = func.greatest(func.similarity(model.name, term), func.ts_rank(document, tsquery))
+    return db.session.query(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows')
+    ).filter(model.id.in_(db.session.query(candidates.c.id))).order_by(
+        rank.desc(), model.name
+    ).limit(limit).all()
+
+def _search_in_process(model, term, limit):
+    # fallback for databases without pg_trgm / tsvector support (e.g. SQLite test runs)
+    rows = db.session.query(
+        model.id, model.name, model.city, model.state, model.genres, model.upcoming_shows_count
+    ).all()
+    scored = ((_score(row, term), row) for row in rows)
+    top = heapq.nlargest(limit, (item for item in scored if item[0] > 0),
+                         key=lambda item: (item[0], -item[1].id))
+    return [
+        {'id': row.id, 'name': row.name, 'num_upcoming_shows': row.upcoming_shows_count}
+        for _, row in top
+    ]
+
+def _score(row, term):
+    term = term.lower()
+    name = (row.name or '').lower()
+    score = 0.0
+    if term in name:
+        score += 2.0 if name.startswith(term) else 1.0
+        score += len(term) / max(len(name), 1)
+    words = set(' '.join([row.city or '', row.state or ''] + list(row.genres or [])).lower().split())
+    score += 0.5 * sum(1 for word in term.split() if word in words)
+    return score
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from cache import fragments
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+class FragmentCacheExtension(Extension):
+    # {% cache key[, ttl] %}...{% endcache %} keeps the rendered block in the
+    # fragment cache, apart from the page cache. Keys are hashed from the repr of the key expression, so passing
+    # the data the block renders (e.g. ('show', show)) makes stale fragments
+    # impossible: changed data simply misses.
+
+    tags = set(['cache'])
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached', args), [], [], body).set_lineno(lineno)
+
+    def _cached(self, key, ttl, caller):
+        return fragments.get_or_set(fragment_key(key), caller, ttl)
+
+def fragment_key(key):
+    return 'fragment:' + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+#----------------------------------------------------------------------------#
+# Extension.
+#----------------------------------------------------------------------------#
+
+def private_directory(directory):
+    # bytecode is loaded with marshal, so whoever can write the directory can
+    # run code in the app: it must be ours and writable by nobody else
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    status = os.stat(directory)
+    if (hasattr(os, 'getuid') and status.st_uid != os.getuid()) or status.st_mode & 0o022:
+        raise RuntimeError('TEMPLATE_CACHE_DIR {} must be owned by this user and not '
+                           'writable by group or others.'.format(directory))
+    return directory
+
+class Templates(object):
+    # compiled templates are kept on disk, so new workers skip compiling them;
+    # run `flask precompile-templates` at deploy time to fill the cache
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config.get('TEMPLATE_CACHE_ENABLED', True):
+            directory = app.config.get('TEMPLATE_CACHE_DIR')
+            # without a directory, Jinja picks (and checks) a private per-user one
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(
+                private_directory(directory) if directory else None)
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        fragments.init_app(app)
+        app.extensions['templates'] = self
+
+    def precompile(self, app):
+        # loads every template once; returns the number compiled
+        names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith('.html'))
+        for name in names:
+            app.jinja_env.get_template(name)
+        return len(names)
+
+
+templates = Templates()
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.command('precompile-templates')
+@with_appcontext
+def precompile_command():
+    """Compile every template into the on-disk bytecode cache."""
+    app = current_app._get_current_object()
+    if app.jinja_env.bytecode_cache is None:
+        raise click.ClickException('TEMPLATE_CACHE_ENABLED is off.')
+    started = time.monotonic()
+    compiled = templates.precompile(app)
+    click.echo('Compiled {} templates into {} in {:.2f}s'.format(
+        compiled, app.jinja_env.bytecode_cache.directory, time.monotonic() - started))
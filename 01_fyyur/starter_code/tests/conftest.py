@@ -0,0 +1,52 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from benchmarks.seed import seed_catalog
+from models import db
+
+# PostgreSQL-only tests run against TEST_DATABASE_URL, a scratch database the
+# migrations are applied to; everything else uses in-memory SQLite
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+def make_app(database_url='sqlite://', **config):
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+        # every request reaches the database unless a test asks for a cache
+        'CACHE_TYPE': 'null'
+    }
+    settings.update(config)
+    return create_app(settings)
+
+@pytest.fixture
+def seeded_app():
+    # seeded_app(venues, artists, shows) -> an app over a fresh SQLite catalog
+    def build(venues=5, artists=5, shows=20):
+        app = make_app()
+        with app.app_context():
+            db.create_all()
+            seed_catalog(venues, artists, shows)
+        return app
+    return build
+
+@contextmanager
+def record_statements(engine):
+    # collects every (statement, parameters) sent to the database inside the block
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+@pytest.fixture
+def client(seeded_app):
+    return seeded_app(venues=3, artists=3, shows=12).test_client()
+
+@pytest.mark.parametrize('path', [
+    '/api/v1/venues?fields=name,nope',
+    '/api/v1/venues/1?fields=name,nope',
+    '/api/v1/artists/1?fields=nope',
+    '/api/v1/shows?fields=venue_name,nope',
+    '/api/v1/search/venues?q=band&fields=nope',
+])
+def test_unknown_fields_are_rejected(client, path):
+    assert client.get(path).status_code == 400
+
+def test_fields_trim_every_endpoint(client):
+    venue = json.loads(client.get('/api/v1/venues/1?fields=name,upcoming_shows_count').data)
+    assert sorted(venue) == ['name', 'upcoming_shows_count']
+    shows = json.loads(client.get('/api/v1/shows?fields=venue_name&limit=5').data)
+    assert [sorted(show) for show in shows['data']] == [['venue_name']] * 5
+    assert shows['next']
+    following = json.loads(client.get('/api/v1/shows?fields=venue_name&limit=5&after=' + shows['next']).data)
+    assert len(following['data']) == 5
@@ -0,0 +1,45 @@
+import os
+
+import click
+from flask.cli import FlaskGroup
+from flask.logging import default_handler
+
+from app import cli_command
+from cache import cache
+from logs import SamplingQueueHandler
+from conftest import make_app
+
+def test_two_apps_share_one_log_handler(tmpdir):
+    log_file = os.path.join(str(tmpdir), 'fyyur.log')
+    first = make_app(DEBUG=False, TESTING=False, LOG_FILE=log_file)
+    second = make_app(DEBUG=False, TESTING=False, LOG_FILE=log_file)
+    try:
+        handlers = [handler for handler in second.logger.handlers if isinstance(handler, SamplingQueueHandler)]
+        assert len(handlers) == 1
+        assert first.extensions['logs'] is second.extensions['logs'] is handlers[0]
+    finally:
+        for handler in handlers:
+            handler.stop()
+            second.logger.removeHandler(handler)
+        second.logger.addHandler(default_handler)
+
+def test_apps_keep_their_own_caches():
+    first = make_app(CACHE_TYPE='simple')
+    second = make_app(CACHE_TYPE='simple', CACHE_DEFAULT_TTL=60)
+    with first.app_context():
+        cache.get_or_set('venues', lambda: ['first'])
+    with second.app_context():
+        assert cache.get_or_set('venues', lambda: ['second']) == ['second']
+        assert cache.state().default_ttl == 60
+    with first.app_context():
+        assert cache.get_or_set('venues', lambda: ['second']) == ['first']
+        assert cache.stats()['hits'] == 1
+
+def test_only_flask_db_is_a_migration_command():
+    flask = FlaskGroup()
+    with click.Context(flask, info_name='flask'):
+        assert cli_command(['flask', 'db', 'upgrade']) == 'db'
+        assert cli_command(['flask', '--app', 'db', 'run']) == 'run'
+    with click.Context(click.Command('uvicorn'), info_name='uvicorn'):
+        assert cli_command(['uvicorn', 'db:app']) is None
+    assert cli_command(['flask', 'db', 'upgrade']) is None
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+
+import pytest
+from asgiref.testing import ApplicationCommunicator
+
+from asgi import ASGIAdapter
+from benchmarks.serving import _scope
+from models import Venue
+
+def request(application, method, path, data=None):
+    # drives one request through the ASGI app; returns (status, body)
+    scope, body = _scope(method, path, data)
+
+    async def run():
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({'type': 'http.request', 'body': body, 'more_body': False})
+        start = await communicator.receive_output(10)
+        chunks = []
+        while True:
+            message = await communicator.receive_output(10)
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        await communicator.wait(10)
+        return start['status'], b''.join(chunks)
+    return asyncio.run(run())
+
+@pytest.fixture
+def application(seeded_app):
+    app = seeded_app(venues=3, artists=3, shows=30)
+    adapter = ASGIAdapter(app, 2)
+    yield app, adapter
+    adapter.executor.shutdown()
+
+def test_lifespan():
+    adapter = ASGIAdapter(None, 1)
+
+    async def run():
+        communicator = ApplicationCommunicator(adapter, {'type': 'lifespan'})
+        await communicator.send_input({'type': 'lifespan.startup'})
+        assert (await communicator.receive_output(5))['type'] == 'lifespan.startup.complete'
+        await communicator.send_input({'type': 'lifespan.shutdown'})
+        assert (await communicator.receive_output(5))['type'] == 'lifespan.shutdown.complete'
+    asyncio.run(run())
+
+@pytest.mark.parametrize('path', ['/', '/venues', '/artists', '/shows', '/venues/{venue}', '/artists/1'])
+def test_read_routes(application, path):
+    app, adapter = application
+    with app.app_context():
+        venue = Venue.query.first()
+    wsgi = app.test_client().get(path.format(venue=venue.id))
+    status, body = request(adapter, 'GET', path.format(venue=venue.id))
+    assert status == wsgi.status_code == 200
+    assert body == wsgi.data
+
+def test_search(application):
+    app, adapter = application
+    with app.app_context():
+        name = Venue.query.first().name
+    status, body = request(adapter, 'POST', '/venues/search', {'search_term': name})
+    assert status == 200
+    assert name.encode('utf-8') in body
+
+def test_streamed_page_is_complete(application):
+    _, adapter = application
+    status, body = request(adapter, 'GET', '/shows?stream=1')
+    assert status == 200
+    assert body.rstrip().endswith(b'</html>')
+
+def test_response_is_closed():
+    closed = []
+
+    class Body(list):
+        def close(self):
+            closed.append(True)
+
+    def wsgi_app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return Body([b'ok'])
+    adapter = ASGIAdapter(wsgi_app, 1)
+    assert request(adapter, 'GET', '/') == (200, b'ok')
+    assert closed == [True]
+    adapter.executor.shutdown()
+
+def test_views_run_on_the_pool(application):
+    app, adapter = application
+    threads = set()
+    app.before_request(lambda: threads.add(threading.current_thread().name))
+
+    async def run():
+        async def one():
+            scope, body = _scope('GET', '/venues', None)
+            communicator = ApplicationCommunicator(adapter, scope)
+            await communicator.send_input({'type': 'http.request', 'body': body})
+            start = await communicator.receive_output(10)
+            while (await communicator.receive_output(10)).get('more_body'):
+                pass
+            return start['status']
+        return await asyncio.gather(*[one() for _ in range(10)])
+    assert asyncio.run(run()) == [200] * 10
+    assert len(threads) <= 2
+    assert all(name.startswith('asgi-view') for name in threads)
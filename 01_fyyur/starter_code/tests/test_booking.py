@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+import pytest
+
+from booking import BookingIndex
+from models import Venue, Artist, Show
+
+def test_conflict_sees_past_overlapping_bookings():
+    # a long legacy booking, and a short one overlapping it, both stored
+    index = BookingIndex()
+    index.add(1, 0, 100)
+    index.add(1, 10, 20)
+    assert index.conflict(1, 50, 60) == (0, 100)
+    assert index.conflict(1, 100, 110) is None
+    assert index.conflict(2, 50, 60) is None
+
+def test_free_skips_overlapping_bookings():
+    index = BookingIndex()
+    index.add(1, 0, 100)
+    index.add(1, 10, 20)
+    index.add(1, 120, 130)
+    assert index.free(1, 50, 150) == [(100, 120), (130, 150)]
+
+@pytest.fixture
+def batch(seeded_app):
+    # a seeded app, its venue and artist ids, and post(items) -> (status, JSON)
+    # of a /shows/batch request; the seeded shows are all over by 2040
+    app = seeded_app(venues=3, artists=3, shows=10)
+    client = app.test_client()
+
+    def post(items):
+        response = client.post('/shows/batch', json=items)
+        return response.status_code, response.get_json()
+    with app.app_context():
+        return SimpleNamespace(
+            app=app,
+            post=post,
+            venue_ids=[venue.id for venue in Venue.query.order_by(Venue.id)],
+            artist_ids=[artist.id for artist in Artist.query.order_by(Artist.id)])
+
+def show(batch, venue, artist, start_time, **fields):
+    fields.update(venue_id=batch.venue_ids[venue], artist_id=batch.artist_ids[artist], start_time=start_time)
+    return fields
+
+def test_batch_reports_each_row(batch):
+    status, body = batch.post({'shows': [
+        show(batch, 0, 0, '2040-01-01T20:00:00'),
+        show(batch, 1, 1, 'not a date'),
+        show(batch, 1, 1, '2040-01-01T20:00:00', end_time='2040-01-01T19:00:00'),
+        'a show',
+        show(batch, 2, 2, '2040-01-01T20:00:00+02:00'),
+    ]})
+    assert status == 200
+    assert body['created'] == 2
+    statuses = [result['status'] for result in body['results']]
+    assert statuses == ['created', 'invalid', 'invalid', 'invalid', 'created']
+    assert list(body['results'][1]['errors']) == ['start_time']
+    assert list(body['results'][2]['errors']) == ['end_time']
+    with batch.app.app_context():
+        stored = Show.query.get(body['results'][4]['id'])
+        # stored as naive UTC
+        assert str(stored.start_time) == '2040-01-01 18:00:00'
+
+def test_rows_of_one_batch_conflict_with_each_other(batch):
+    status, body = batch.post([
+        show(batch, 0, 0, '2040-01-01T20:00:00'),
+        show(batch, 0, 1, '2040-01-01T21:00:00'),
+        show(batch, 1, 0, '2040-01-01T21:59:00'),
+        show(batch, 1, 1, '2040-01-01T22:00:00'),
+    ])
+    assert status == 200
+    results = body['results']
+    assert [result['status'] for result in results] == ['created', 'conflict', 'conflict', 'created']
+    assert list(results[1]['errors']) == ['venue_id']
+    assert list(results[2]['errors']) == ['artist_id']
+    # a later batch is checked against the stored shows
+    status, body = batch.post([show(batch, 0, 2, '2040-01-01T21:30:00')])
+    assert body['results'][0]['status'] == 'conflict'
+
+def test_unknown_ids_are_invalid(batch):
+    status, body = batch.post([
+        {'venue_id': max(batch.venue_ids) + 1, 'artist_id': batch.artist_ids[0], 'start_time': '2040-01-01T20:00:00'},
+        {'venue_id': batch.venue_ids[0], 'artist_id': max(batch.artist_ids) + 1, 'start_time': '2040-01-01T20:00:00'},
+        {'venue_id': 'one', 'artist_id': batch.artist_ids[0], 'start_time': '2040-01-01T20:00:00'},
+    ])
+    assert status == 200
+    assert body['created'] == 0
+    assert [result['errors'] for result in body['results']] == [
+        {'venue_id': ['Unknown venue.']},
+        {'artist_id': ['Unknown artist.']},
+        {'venue_id': ['Expected an integer id.']},
+    ]
+    with batch.app.app_context():
+        assert Show.query.count() == 10
+
+@pytest.mark.parametrize('items, status', [
+    ([], 200),
+    ([None] * 3, 200),
+    ([None] * 4, 400),
+    ({'shows': [None] * 4}, 400),
+    ({'venue_id': 1}, 400),
+    ('shows', 400),
+])
+def test_batch_size_is_capped(batch, items, status):
+    batch.app.config['MAX_BATCH_SHOWS'] = 3
+    assert batch.post(items)[0] == status
@@ -0,0 +1,26 @@
+import io
+
+from conftest import make_app
+from benchmarks.seed import seed_catalog
+from bulk import snapshot, export_lines, import_rows
+from models import db, Show
+
+def test_exported_shows_import_again():
+    source = make_app()
+    with source.app_context():
+        db.create_all()
+        seed_catalog(venues=3, artists=3, shows=12)
+        with snapshot() as connection:
+            lines = list(export_lines(connection, 'shows'))
+    assert 'T' in lines[0]
+
+    # the same venues and artists, without their shows
+    target = make_app()
+    with target.app_context():
+        db.create_all()
+        seed_catalog(venues=3, artists=3, shows=0)
+        rejected = []
+        imported, _ = import_rows('shows', io.StringIO(''.join(lines)),
+                                  reject=lambda number, errors: rejected.append((number, errors)))
+        assert rejected == []
+        assert imported == Show.query.count() == 12
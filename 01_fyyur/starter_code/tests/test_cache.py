@@ -0,0 +1,150 @@
+import fnmatch
+
+import pytest
+
+from benchmarks.seed import seed_catalog
+from cache import cache, RedisCache
+from models import db, Venue, Artist, Show
+from conftest import make_app
+
+class FakeRedis(object):
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match='*', count=None):
+        return iter([key for key in list(self.data) if fnmatch.fnmatchcase(key, match)])
+
+def test_redis_clear_keeps_other_prefixes():
+    client = FakeRedis()
+    client.set('other:session', b'keep')
+    cache = RedisCache(client)
+    for number in range(2500):
+        cache.set('venue:{}'.format(number), {'id': number})
+    cache.clear()
+    assert list(client.data) == ['other:session']
+    assert cache.get('venue:1') is None
+
+VENUE_FORM = {'name': 'Zebra Room', 'city': 'Austin', 'state': 'TX', 'address': '1 Main Street',
+              'phone': '512-555-0100', 'genres': 'Jazz', 'facebook_link': ''}
+ARTIST_FORM = {'name': 'Zebra Quartet', 'city': 'Austin', 'state': 'TX', 'phone': '512-555-0101',
+               'genres': 'Jazz', 'facebook_link': ''}
+
+@pytest.fixture
+def catalog():
+    # an app with the in-process LRU cache and a seeded catalog, as (app, a
+    # venue with shows, its artists, an artist it has no show with)
+    app = make_app(CACHE_TYPE='simple')
+    with app.app_context():
+        db.create_all()
+        seed_catalog(3, 3, 12)
+        venue = Venue.query.join(Show).first()
+        artist_ids = sorted(set(show.artist_id for show in venue.shows))
+        other_artist = Artist.query.filter(~Artist.id.in_(artist_ids)).first()
+        return app, venue.id, artist_ids, other_artist.id
+
+def cached_keys(app):
+    return set(cache.state(app).backend._data)
+
+def prime(app, venue_id, artist_ids):
+    # fills the listing and detail entries; returns the keys cached
+    client = app.test_client()
+    paths = ['/', '/venues', '/artists', '/shows', '/venues/{}'.format(venue_id), '/api/v1/venues/{}'.format(venue_id)]
+    for artist_id in artist_ids:
+        paths += ['/artists/{}'.format(artist_id), '/api/v1/artists/{}'.format(artist_id)]
+    for path in paths:
+        assert client.get(path).status_code == 200
+    return cached_keys(app)
+
+def assert_evicts(app, primed, evicted):
+    # exactly `evicted` is gone, every other entry is kept
+    assert set(evicted) <= primed
+    assert cached_keys(app) == primed - set(evicted)
+
+def test_creating_a_venue_evicts_the_venue_listings(catalog):
+    app, venue_id, artist_ids, _ = catalog
+    primed = prime(app, venue_id, artist_ids)
+    app.test_client().post('/venues/create', data=VENUE_FORM)
+    assert_evicts(app, primed, ['index:venues', 'venues'])
+    assert 'Zebra Room' in app.test_client().get('/venues').get_data(as_text=True)
+
+def test_creating_an_artist_evicts_the_artist_listings(catalog):
+    app, venue_id, artist_ids, _ = catalog
+    primed = prime(app, venue_id, artist_ids)
+    app.test_client().post('/artists/create', data=ARTIST_FORM)
+    assert_evicts(app, primed, ['index:artists', 'artists'])
+    assert 'Zebra Quartet' in app.test_client().get('/').get_data(as_text=True)
+
+def test_editing_a_venue_evicts_its_pages_and_its_artists(catalog):
+    app, venue_id, artist_ids, _ = catalog
+    primed = prime(app, venue_id, artist_ids)
+    client = app.test_client()
+    client.post('/venues/{}/edit'.format(venue_id), data=VENUE_FORM)
+    assert_evicts(app, primed, ['index:venues', 'venues', 'shows', 'venue:{}'.format(venue_id)] +
+                  ['artist:{}'.format(artist_id) for artist_id in artist_ids])
+    # the detail pages are cached under their ETag, which the edit changed
+    for path in ['/venues/{}'.format(venue_id), '/api/v1/venues/{}'.format(venue_id),
+                 '/artists/{}'.format(artist_ids[0]), '/shows', '/venues']:
+        assert 'Zebra Room' in client.get(path).get_data(as_text=True), path
+    # search results are not cached
+    assert 'Zebra Room' in client.post('/venues/search', data={'search_term': 'zebra'}).get_data(as_text=True)
+
+def test_editing_an_artist_evicts_its_pages_and_its_venues(catalog):
+    app, venue_id, artist_ids, _ = catalog
+    primed = prime(app, venue_id, artist_ids)
+    client = app.test_client()
+    artist_id = artist_ids[0]
+    with app.app_context():
+        venue_ids = sorted(set(show.venue_id for show in Show.query.filter_by(artist_id=artist_id)))
+    client.post('/artists/{}/edit'.format(artist_id), data=ARTIST_FORM)
+    assert_evicts(app, primed, ['index:artists', 'artists', 'shows', 'artist:{}'.format(artist_id)] +
+                  ['venue:{}'.format(other_id) for other_id in venue_ids if 'venue:{}'.format(other_id) in primed])
+    for path in ['/artists/{}'.format(artist_id), '/api/v1/artists/{}'.format(artist_id),
+                 '/venues/{}'.format(venue_id), '/api/v1/venues/{}'.format(venue_id), '/shows', '/']:
+        assert 'Zebra Quartet' in client.get(path).get_data(as_text=True), path
+    assert 'Zebra Quartet' in client.post('/artists/search', data={'search_term': 'zebra'}).get_data(as_text=True)
+
+def test_deleting_a_venue_evicts_its_pages_and_its_artists(catalog):
+    app, venue_id, artist_ids, _ = catalog
+    primed = prime(app, venue_id, artist_ids)
+    client = app.test_client()
+    with app.app_context():
+        name = Venue.query.get(venue_id).name
+    client.delete('/venues/{}'.format(venue_id))
+    assert_evicts(app, primed, ['index:venues', 'venues', 'shows', 'venue:{}'.format(venue_id)] +
+                  ['artist:{}'.format(artist_id) for artist_id in artist_ids])
+    assert client.get('/api/v1/venues/{}'.format(venue_id)).status_code == 404
+    assert client.get('/venues/{}'.format(venue_id)).status_code == 404
+    for path in ['/venues', '/shows', '/artists/{}'.format(artist_ids[0])]:
+        assert name not in client.get(path).get_data(as_text=True), path
+
+@pytest.mark.parametrize('path, data', [
+    ('/shows/create', lambda venue_id, artist_id: {'venue_id': venue_id, 'artist_id': artist_id,
+                                                    'start_time': '2040-01-01 20:00:00'}),
+    ('/shows/batch', lambda venue_id, artist_id: [{'venue_id': venue_id, 'artist_id': artist_id,
+                                                   'start_time': '2040-01-01T20:00:00'}]),
+])
+def test_creating_a_show_evicts_its_venue_and_artist(catalog, path, data):
+    app, venue_id, artist_ids, other_artist = catalog
+    primed = prime(app, venue_id, artist_ids + [other_artist])
+    client = app.test_client()
+    payload = data(venue_id, other_artist)
+    if isinstance(payload, list):
+        client.post(path, json=payload)
+    else:
+        client.post(path, data=payload)
+    assert_evicts(app, primed, ['venues', 'shows', 'venue:{}'.format(venue_id), 'artist:{}'.format(other_artist)])
+    with app.app_context():
+        assert Show.query.filter_by(venue_id=venue_id, artist_id=other_artist).count() == 1
+    for show_path in ['/api/v1/venues/{}'.format(venue_id), '/api/v1/artists/{}'.format(other_artist)]:
+        assert '2040-01-01' in client.get(show_path).get_data(as_text=True), show_path
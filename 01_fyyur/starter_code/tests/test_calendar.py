@@ -0,0 +1,90 @@
+from collections import Counter
+from datetime import date
+
+import pytest
+
+from counters import show_days
+from models import db, Venue, Artist, Show, VenueDay, ArtistDay
+
+def buckets(model, key):
+    # the stored day buckets as {(owner id, day): (shows, booked minutes)}
+    return dict(((getattr(row, key), row.day), (row.shows, row.booked_minutes)) for row in model.query)
+
+def expected_buckets(key):
+    # the day buckets rebuilt from the Show table
+    shows, minutes = Counter(), Counter()
+    for show in Show.query:
+        for day, booked in show_days(show.start_time, show.end_time):
+            shows[(getattr(show, key), day)] += 1
+            minutes[(getattr(show, key), day)] += booked
+    return dict((bucket, (shows[bucket], minutes[bucket])) for bucket in shows)
+
+def assert_buckets_match():
+    assert buckets(VenueDay, 'venue_id') == expected_buckets('venue_id')
+    assert buckets(ArtistDay, 'artist_id') == expected_buckets('artist_id')
+
+def test_day_buckets_follow_shows(seeded_app):
+    app = seeded_app(venues=3, artists=3, shows=10)
+    client = app.test_client()
+    with app.app_context():
+        assert_buckets_match()
+        venue_ids = [venue.id for venue in Venue.query.order_by(Venue.id)]
+        artist_ids = [artist.id for artist in Artist.query.order_by(Artist.id)]
+    client.post('/shows/create', data={'venue_id': venue_ids[0], 'artist_id': artist_ids[0],
+                                       'start_time': '2040-03-01 20:00:00'})
+    response = client.post('/shows/batch', json=[
+        # past midnight, into the next day
+        {'venue_id': venue_ids[0], 'artist_id': artist_ids[1],
+         'start_time': '2040-03-02T23:00:00', 'end_time': '2040-03-03T01:30:00'},
+        {'venue_id': venue_ids[1], 'artist_id': artist_ids[0], 'start_time': '2040-03-02T12:00:00'},
+        {'venue_id': venue_ids[2], 'artist_id': artist_ids[2], 'start_time': '2040-03-02T12:00:00'},
+    ])
+    assert response.get_json()['created'] == 3
+    with app.app_context():
+        assert_buckets_match()
+        assert buckets(VenueDay, 'venue_id')[(venue_ids[0], date(2040, 3, 3))] == (1, 90)
+        assert buckets(ArtistDay, 'artist_id')[(artist_ids[0], date(2040, 3, 2))] == (1, 120)
+
+    client.delete('/venues/{}'.format(venue_ids[0]))
+    with app.app_context():
+        assert_buckets_match()
+        assert not VenueDay.query.filter_by(venue_id=venue_ids[0]).count()
+        # the artist's day left with only the deleted venue's show is free again
+        assert (artist_ids[1], date(2040, 3, 3)) not in buckets(ArtistDay, 'artist_id')
+
+def test_calendar_shows_booked_days(seeded_app):
+    app = seeded_app(venues=1, artists=1, shows=0)
+    client = app.test_client()
+    with app.app_context():
+        venue_id, artist_id = Venue.query.first().id, Artist.query.first().id
+    client.post('/shows/batch', json=[{'venue_id': venue_id, 'artist_id': artist_id, 'start_time': '2040-03-02T20:00:00'}])
+    response = client.get('/api/v1/venues/{}/calendar?start=2040-03&months=1'.format(venue_id))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['start'], body['end']) == ('2040-03-01', '2040-04-01')
+    assert [(day['day'], day['shows']) for day in body['booked']] == [('2040-03-02', 1)]
+    assert client.get('/venues/{}/calendar?start=2040-03&months=1'.format(venue_id)).status_code == 200
+
+@pytest.mark.parametrize('query', [
+    'start=2040',
+    'start=2040-13',
+    'start=March',
+    'start=9999-12&months=2',
+    'months=0',
+    'months=-1',
+    'months=25',
+    'months=many',
+])
+@pytest.mark.parametrize('path', [
+    '/venues/{venue}/calendar',
+    '/artists/{artist}/calendar',
+    '/api/v1/venues/{venue}/calendar',
+    '/api/v1/artists/{artist}/calendar',
+])
+def test_calendar_rejects_bad_ranges(seeded_app, path, query):
+    app = seeded_app(venues=1, artists=1, shows=0)
+    with app.app_context():
+        url = path.format(venue=Venue.query.first().id, artist=Artist.query.first().id)
+    client = app.test_client()
+    assert client.get(url + '?months=24').status_code == 200
+    assert client.get(url + '?' + query).status_code == 400
@@ -0,0 +1,33 @@
+import re
+from datetime import date, timedelta
+
+import queries
+from conftest import make_app
+from benchmarks.seed import seed_catalog
+from models import db
+
+def upcoming_count(body):
+    return int(re.search(r'(\d+) Upcoming', body).group(1))
+
+def test_cached_venue_page_matches_its_etag(monkeypatch):
+    app = make_app(CACHE_TYPE='simple')
+    with app.app_context():
+        db.create_all()
+        venue_ids, _ = seed_catalog(venues=1, artists=3, shows=10)
+    client = app.test_client()
+    path = '/venues/{}'.format(venue_ids[0])
+    first = client.get(path)
+    assert upcoming_count(first.get_data(as_text=True)) > 0
+
+    # shows move to the past at midnight without any write
+    class Later(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=365)
+    monkeypatch.setattr(queries, 'date', Later)
+
+    second = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert upcoming_count(second.get_data(as_text=True)) == 0
+    assert client.get(path, headers={'If-None-Match': second.headers['ETag']}).status_code == 304
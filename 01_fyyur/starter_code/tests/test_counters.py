@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import counters
+from models import Venue, Artist
+
+def check(app):
+    # the output of `flask check-counters --dry-run`
+    result = app.test_cli_runner().invoke(args=['check-counters', '--dry-run'])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+def stored_counts(app):
+    with app.app_context():
+        return dict(((model.__name__, row.id), (row.upcoming_shows_count, row.past_shows_count))
+                    for model in (Venue, Artist) for row in model.query)
+
+def test_counters_follow_every_write(seeded_app, monkeypatch):
+    app = seeded_app(venues=3, artists=3, shows=20)
+    client = app.test_client()
+    assert check(app) == '0 counters drifted.\n'
+    with app.app_context():
+        venue_ids = [venue.id for venue in Venue.query.order_by(Venue.id)]
+        artist_ids = [artist.id for artist in Artist.query.order_by(Artist.id)]
+    tomorrow = datetime.combine(counters.today().date() + timedelta(days=1), datetime.min.time())
+
+    # single shows, one upcoming and one past
+    for start_time in (tomorrow + timedelta(hours=20), datetime(2001, 5, 1, 20)):
+        client.post('/shows/create', data={'venue_id': venue_ids[0], 'artist_id': artist_ids[0],
+                                           'start_time': start_time.isoformat()})
+    # a batch, spread over the venues and artists after the seeded shows
+    response = client.post('/shows/batch', json=[
+        {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': (tomorrow + timedelta(hours=12 + 3 * hour)).isoformat()}
+        for hour, (venue_id, artist_id) in enumerate(zip(venue_ids[1:], artist_ids[1:]))
+    ] + [{'venue_id': venue_ids[1], 'artist_id': artist_ids[0], 'start_time': '2040-01-01T20:00:00'}])
+    assert response.get_json()['created'] == 3
+    assert check(app) == '0 counters drifted.\n'
+
+    # deleting a venue takes its shows off its artists' counters
+    client.delete('/venues/{}'.format(venue_ids[2]))
+    assert check(app) == '0 counters drifted.\n'
+
+    # two days on, the shows up to tomorrow have started but are still counted
+    # as upcoming
+    later = tomorrow + timedelta(days=1)
+    monkeypatch.setattr(counters, 'today', lambda: later)
+    assert check(app) != '0 counters drifted.\n'
+    before = stored_counts(app)
+    result = app.test_cli_runner().invoke(args=['roll-counters'])
+    assert result.exit_code == 0, result.output
+    assert check(app) == '0 counters drifted.\n'
+    # every show of the first venue has started by now
+    upcoming, past = before[('Venue', venue_ids[0])]
+    assert upcoming and stored_counts(app)[('Venue', venue_ids[0])] == (0, upcoming + past)
+
+def test_check_counters_repairs_drift(seeded_app):
+    app = seeded_app(venues=2, artists=2, shows=10)
+    with app.app_context():
+        venue = Venue.query.first()
+        venue.upcoming_shows_count += 3
+        counters.db.session.commit()
+        venue_id = venue.id
+    assert 'Venue {}: stored'.format(venue_id) in check(app)
+    # a dry run leaves the drift in place
+    assert check(app).endswith('1 counters drifted.\n')
+    result = app.test_cli_runner().invoke(args=['check-counters'])
+    assert result.output.endswith('1 counters drifted.\n')
+    assert check(app) == '0 counters drifted.\n'
@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from conftest import TEST_DATABASE_URL, make_app, record_statements
+from benchmarks.seed import seed_catalog
+from models import db
+
+pytestmark = pytest.mark.skipif(
+    not (TEST_DATABASE_URL or '').startswith('postgres'),
+    reason='needs TEST_DATABASE_URL pointing at a scratch PostgreSQL database'
+)
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+@pytest.fixture(scope='module')
+def app():
+    # the schema comes from the migrations, so the plans see the real indexes;
+    # the catalog is large enough that the planner prefers them
+    from flask_migrate import Migrate, upgrade, downgrade
+    app = make_app(TEST_DATABASE_URL)
+    Migrate(app, db, directory=MIGRATIONS)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        seed_catalog(venues=2000, artists=2000, shows=40000)
+        db.session.execute('ANALYZE')
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        downgrade(directory=MIGRATIONS, revision='base')
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        for node in plan_nodes(child):
+            yield node
+
+def explain_page(app, path):
+    # EXPLAINs every statement the page sends, with the parameters it sent them with
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    with record_statements(engine) as statements:
+        assert client.get(path).status_code == 200
+    nodes = []
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        for statement, params in statements:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes.extend(plan_nodes(plan[0]['Plan']))
+    finally:
+        connection.close()
+    return nodes
+
+def index_scans(nodes):
+    return set(node['Index Name'] for node in nodes
+               if node['Node Type'] in ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan'))
+
+def seq_scans(nodes):
+    return set(node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan')
+
+def first_id(app, table):
+    with app.app_context():
+        return db.session.execute('SELECT min(id) FROM "{}"'.format(table)).scalar()
+
+def test_venue_page_uses_show_venue_index(app):
+    nodes = explain_page(app, '/venues/{}'.format(first_id(app, 'Venue')))
+    assert 'ix_show_venue_id_start_time' in index_scans(nodes)
+    assert 'Show' not in seq_scans(nodes)
+
+def test_artist_page_uses_show_artist_index(app):
+    nodes = explain_page(app, '/artists/{}'.format(first_id(app, 'Artist')))
+    assert 'ix_show_artist_id_start_time' in index_scans(nodes)
+    assert 'Show' not in seq_scans(nodes)
+
+def test_shows_listing_uses_start_time_index(app):
+    nodes = explain_page(app, '/shows')
+    assert 'ix_show_start_time' in index_scans(nodes)
+    assert 'Show' not in seq_scans(nodes)
+
+def test_home_uses_created_date_indexes(app):
+    nodes = explain_page(app, '/')
+    assert set(['ix_venue_created_date', 'ix_artist_created_date']) <= index_scans(nodes)
+    assert not set(['Venue', 'Artist']) & seq_scans(nodes)
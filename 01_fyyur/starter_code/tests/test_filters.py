@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+
+import babel.dates
+import pytest
+
+from app import DATETIME_FORMATS, format_datetime
+
+VALUES = [datetime(2020, 5, 21, 21, 30), datetime(2035, 4, 1, 8, 5, tzinfo=timezone.utc)]
+
+@pytest.mark.parametrize('value', VALUES)
+@pytest.mark.parametrize('format', ['full', 'long', 'medium', 'short', "yyyy-MM-dd HH:mm zzzz"])
+def test_matches_babel(value, format):
+    expected = babel.dates.format_datetime(value, DATETIME_FORMATS.get(format, format))
+    assert format_datetime(value, format) == expected
+    # a second call comes from the cache
+    assert format_datetime(value, format) == expected
+
+def test_parses_strings():
+    assert format_datetime('2020-05-21T21:30:00', 'short') == \
+        babel.dates.format_datetime(datetime(2020, 5, 21, 21, 30), 'short')
@@ -0,0 +1,83 @@
+import logging
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from instrumentation import normalize_parameters, statement_shape
+from models import db
+from conftest import make_app, record_statements
+
+def test_parameters_are_logged_without_values():
+    assert normalize_parameters({'phone': '555-0100', 'id': 7}) == '{id: int, phone: str}'
+    assert normalize_parameters(('%secret%', 50)) == '(str, int)'
+    assert normalize_parameters([{'day': date(2040, 1, 1)}, {'day': None}], executemany=True) == '[{day: date} ... x2]'
+    assert normalize_parameters([], executemany=True) == '[]'
+    assert normalize_parameters(None) == 'NoneType'
+
+def test_statement_shape_collapses_bound_values():
+    assert statement_shape('SELECT * FROM "Show" WHERE id IN (?, ?, ?)') == \
+        statement_shape('SELECT * FROM "Show"\n WHERE id IN (?, ?)')
+    assert statement_shape('INSERT INTO t VALUES (%s, %s), (%s, %s)') == 'INSERT INTO t VALUES (%s, ...), ...'
+
+@pytest.fixture
+def app():
+    app = make_app(SQL_DETECT_N_PLUS_ONE=True, SQL_N_PLUS_ONE_THRESHOLD=2)
+
+    @app.route('/queries/<int:count>')
+    def run_queries(count):
+        for number in range(count):
+            db.session.execute(text('SELECT :number'), {'number': number})
+        return 'ok'
+
+    @app.route('/failing')
+    def failing():
+        for _ in range(3):
+            try:
+                db.session.execute(text('SELECT * FROM missing'))
+            except OperationalError:
+                db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+        return 'ok'
+    return app
+
+def test_requests_are_counted(app):
+    client = app.test_client()
+    with app.app_context(), record_statements(db.engine) as statements:
+        response = client.get('/queries/2')
+    assert len(statements) == 2
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert 'desc="2 queries"' in response.headers['Server-Timing']
+
+def test_repeated_statements_are_reported(app, caplog):
+    client = app.test_client()
+    with caplog.at_level(logging.WARNING, 'app.sql'):
+        client.get('/queries/2')
+        assert not caplog.records
+        client.get('/queries/3')
+    assert [record.repeated for record in caplog.records] == [3]
+    assert caplog.records[0].statement == 'SELECT ?'
+
+def test_failed_statements_leave_no_timing_behind(app):
+    client = app.test_client()
+    response = client.get('/failing')
+    assert 'desc="1 queries"' in response.headers['Server-Timing']
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+            before = repr(connection.info)
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    connection.execute(text('SELECT * FROM missing'))
+            connection.execute(text('SELECT 1'))
+            assert repr(connection.info) == before
+
+def test_slow_queries_are_logged_without_values(app, caplog):
+    app.extensions['sql_stats'].slow_threshold = 0.0
+    with caplog.at_level(logging.WARNING, 'app.sql'), app.app_context():
+        db.session.execute(text('SELECT :phone, :name'), {'phone': '555-0100', 'name': 'Zebra'})
+    [record] = caplog.records
+    assert record.getMessage().startswith('slow query')
+    assert record.getMessage().endswith('SELECT ?, ? (str, str)')
+    assert record.duration_ms >= 0
@@ -0,0 +1,87 @@
+import re
+from datetime import datetime
+
+import pytest
+
+from models import db, Artist, Show, Venue
+from queries import shows_page
+
+def listing(client, url):
+    # (artist ids, prev cursor, next cursor) of a rendered /artists page
+    response = client.get(url)
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    ids = [int(artist_id) for artist_id in re.findall(r'href="/artists/(\d+)"', body)]
+    prev = re.search(r'before=([^&"]+)', body)
+    following = re.search(r'after=([^&"]+)', body)
+    return ids, prev and prev.group(1), following and following.group(1)
+
+def test_artist_pages_forward_and_back(seeded_app):
+    app = seeded_app(artists=7)
+    client = app.test_client()
+    with app.app_context():
+        ids = [artist.id for artist in Artist.query.order_by(Artist.id)]
+    first = listing(client, '/artists?limit=3')
+    assert first[0] == ids[:3] and first[1] is None
+    second = listing(client, '/artists?limit=3&after=' + first[2])
+    assert second[0] == ids[3:6] and second[1] and second[2]
+    last = listing(client, '/artists?limit=3&after=' + second[2])
+    assert last[0] == ids[6:] and last[2] is None
+    assert listing(client, '/artists?limit=3&before=' + last[1]) == second
+    back = listing(client, '/artists?limit=3&before=' + second[1])
+    assert back[0] == ids[:3] and back[1] is None and back[2] == first[2]
+
+def test_show_cursors_break_ties_on_id(seeded_app):
+    app = seeded_app(shows=20)
+    with app.app_context():
+        venue, artist = Venue.query.first(), Artist.query.first()
+        same_time = datetime(2031, 1, 1, 20)
+        db.session.add_all([Show(venue_id=venue.id, artist_id=artist.id, start_time=same_time) for _ in range(4)])
+        db.session.commit()
+        everything = [(show.start_time, show.id) for show in Show.query.order_by(Show.start_time, Show.id)]
+        pages, cursor = [], None
+        while True:
+            page = shows_page(after=cursor, limit=6)
+            pages.append([(row.start_time, row.id) for row in page])
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+        assert sum(pages, []) == everything
+        # and back again from the last page
+        backwards, cursor = [pages[-1]], page.prev_cursor
+        while cursor:
+            page = shows_page(before=cursor, limit=6)
+            backwards.insert(0, [(row.start_time, row.id) for row in page])
+            cursor = page.prev_cursor
+        assert backwards == pages
+
+@pytest.mark.parametrize('url', [
+    '/shows?after=garbage',
+    '/shows?after=20200101T000000.000000_x',
+    '/shows?before=20201301T000000.000000_1',
+    '/shows?after=20200101T000000.000000_99999999999999999999',
+    '/artists?after=abc',
+    '/artists?before=-1',
+    '/artists?after=99999999999999999999',
+    '/artists?after=1&before=5',
+    '/shows?after=garbage&stream=1',
+])
+def test_malformed_cursors_are_rejected(seeded_app, url):
+    app = seeded_app()
+    assert app.test_client().get(url).status_code == 400
+
+@pytest.mark.parametrize('url', ['/shows?limit=4', '/artists?limit=2'])
+def test_streamed_page_matches_rendered_page(seeded_app, url):
+    app = seeded_app()
+    client = app.test_client()
+    rendered = client.get(url).get_data(as_text=True)
+    streamed = client.get(url + '&stream=1').get_data(as_text=True)
+    assert re.sub(r'&(amp;)?stream=1', '', streamed) == rendered
+
+def test_streamed_page_pops_flashed_messages(seeded_app):
+    app = seeded_app()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Show listed!')]
+    assert 'Show listed!' in client.get('/shows?stream=1').get_data(as_text=True)
+    assert 'Show listed!' not in client.get('/shows').get_data(as_text=True)
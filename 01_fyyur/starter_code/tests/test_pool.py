@@ -0,0 +1,65 @@
+import os
+
+from sqlalchemy.pool import StaticPool
+
+from pool import TimedQueuePool
+from conftest import make_app
+
+POSTGRES_URL = 'postgresql://fyyur@localhost/fyyur'
+
+def test_pool_settings_come_from_config():
+    app = make_app(POSTGRES_URL, DATABASE_POOL_SIZE=3, DATABASE_MAX_OVERFLOW=2, DATABASE_POOL_TIMEOUT=4,
+                   DATABASE_POOL_RECYCLE=60, DATABASE_POOL_PRE_PING=False, DATABASE_STATEMENT_TIMEOUT=500,
+                   DATABASE_EXECUTEMANY_MODE='values')
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] == {
+        'poolclass': TimedQueuePool,
+        'pool_size': 3,
+        'max_overflow': 2,
+        'pool_timeout': 4,
+        'pool_recycle': 60,
+        'pool_pre_ping': False,
+        'executemany_mode': 'values',
+        'connect_args': {'options': '-c statement_timeout=500'}
+    }
+
+def test_explicit_engine_options_win():
+    options = {'pool_size': 1}
+    app = make_app(POSTGRES_URL, DATABASE_POOL_SIZE=3, DATABASE_STATEMENT_TIMEOUT=0,
+                   DATABASE_EXECUTEMANY_MODE=None, SQLALCHEMY_ENGINE_OPTIONS=options)
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'] == 1
+    assert 'connect_args' not in app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    assert 'executemany_mode' not in app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    # the caller's mapping is left alone
+    assert options == {'pool_size': 1}
+
+def test_sqlite_keeps_flask_sqlalchemy_defaults():
+    app = make_app(DATABASE_POOL_SIZE=3)
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] == {}
+
+def test_healthz_reports_the_pool(tmpdir):
+    database = 'sqlite:///' + os.path.join(str(tmpdir), 'fyyur.db')
+    app = make_app(database, SQLALCHEMY_ENGINE_OPTIONS={'poolclass': TimedQueuePool, 'pool_size': 2, 'max_overflow': 1})
+    client = app.test_client()
+    client.get('/healthz')
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.cache_control.no_store
+    body = response.get_json()
+    assert body['status'] == 'ok' and body['database']['ok']
+    pool = body['pool']
+    assert pool['class'] == 'TimedQueuePool'
+    assert (pool['size'], pool['checked_out'], pool['idle'], pool['overflow']) == (2, 0, 1, 0)
+    assert pool['checkouts'] == 2 and pool['timeouts'] == 0
+    assert 0 <= pool['wait_seconds_max'] <= pool['wait_seconds_total']
+
+def test_healthz_without_a_queue_pool():
+    app = make_app(SQLALCHEMY_ENGINE_OPTIONS={'poolclass': StaticPool})
+    body = app.test_client().get('/healthz').get_json()
+    assert body['pool'] == {'class': 'StaticPool'}
+
+def test_healthz_reports_an_unreachable_database(tmpdir):
+    app = make_app('sqlite:///' + os.path.join(str(tmpdir), 'missing', 'fyyur.db'))
+    response = app.test_client().get('/healthz')
+    assert response.status_code == 503
+    body = response.get_json()
+    assert body['status'] == 'unavailable' and not body['database']['ok']
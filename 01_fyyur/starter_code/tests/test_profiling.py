@@ -0,0 +1,25 @@
+import json
+import os
+
+import pytest
+
+from conftest import make_app
+from benchmarks.seed import seed_catalog
+from models import db
+
+@pytest.mark.parametrize('path', ['/shows', '/shows?stream=1'])
+def test_breakdown_uses_measured_times(tmpdir, path):
+    pytest.importorskip('blinker')
+    app = make_app(PROFILE_ENABLED=True, PROFILE_TOKEN='secret', PROFILE_DIR=str(tmpdir))
+    with app.app_context():
+        db.create_all()
+        seed_catalog(venues=3, artists=3, shows=30)
+    response = app.test_client().get(path, headers={'X-Profile': 'secret'})
+    response.get_data()
+    response.close()
+    with open(os.path.join(str(tmpdir), response.headers['X-Profile-Id'] + '.json')) as summary:
+        profile = json.load(summary)
+    parts = profile['breakdown']
+    assert parts['sql_ms'] > 0
+    assert parts['template_ms'] > 0
+    assert parts['sql_ms'] + parts['template_ms'] + parts['python_ms'] == pytest.approx(profile['wall_ms'])
@@ -0,0 +1,35 @@
+from models import db, Venue, Artist
+from queries import search
+
+def test_short_terms_match_names(seeded_app):
+    app = seeded_app()
+    with app.app_context():
+        db.session.add_all([
+            Venue(name='The Musical Hop'),
+            Venue(name='Park Square Live Music & Coffee'),
+            Venue(name='The Dueling Pianos Bar'),
+            Artist(name='Guns N Petals'),
+            Artist(name='Matt Quevado'),
+            Artist(name='The Wild Sax Band')
+        ])
+        db.session.commit()
+        venues = [row['name'] for row in search(Venue, 'mu')]
+        assert set(['The Musical Hop', 'Park Square Live Music & Coffee']) <= set(venues)
+        assert 'The Dueling Pianos Bar' not in venues
+        artists = [row['name'] for row in search(Artist, ' A ')]
+        assert set(['Guns N Petals', 'Matt Quevado', 'The Wild Sax Band']) <= set(artists)
+        assert all('a' in name.lower() for name in artists)
+        assert len(search(Artist, 'a', limit=2)) == 2
+        assert len(search(Venue, '')) == Venue.query.count()
+
+def test_search_ranks_name_matches_first(seeded_app):
+    app = seeded_app()
+    with app.app_context():
+        db.session.add_all([
+            Venue(name='The Zydeco Barn', city='San Francisco', state='CA', genres=['Jazz']),
+            Venue(name='Zydeco Hall', city='Austin', state='TX', genres=['Folk'])
+        ])
+        db.session.commit()
+        names = [row['name'] for row in search(Venue, 'zydeco')]
+        assert names == ['Zydeco Hall', 'The Zydeco Barn']
+        assert len(search(Venue, 'zydeco', limit=1)) == 1
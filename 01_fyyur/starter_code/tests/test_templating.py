@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from cache import cache, fragments
+from templating import private_directory
+
+def test_shared_template_directory_is_refused(tmpdir):
+    directory = str(tmpdir.mkdir('templates'))
+    os.chmod(directory, 0o777)
+    with pytest.raises(RuntimeError):
+        private_directory(directory)
+
+def test_new_template_directory_is_private(tmpdir):
+    directory = private_directory(os.path.join(str(tmpdir), 'templates'))
+    assert os.stat(directory).st_mode & 0o077 == 0
+
+def test_fragments_do_not_evict_pages(seeded_app):
+    app = seeded_app(venues=3, artists=3, shows=60)
+    app.config['CACHE_TYPE'] = 'simple'
+    app.config['CACHE_MAX_ENTRIES'] = 10
+    with app.app_context():
+        cache.init_app(app)
+        fragments.init_app(app)
+    client = app.test_client()
+    client.get('/venues')
+    client.get('/shows')
+    assert cache.state(app).backend.get('venues') is not None
+    with app.app_context():
+        assert fragments.stats()['misses'] >= 50
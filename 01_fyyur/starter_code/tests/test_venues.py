@@ -0,0 +1,23 @@
+import re
+
+from conftest import record_statements
+from models import db
+
+def venues_statements(app):
+    client = app.test_client()
+    with app.app_context():
+        engine = db.engine
+    with record_statements(engine) as statements:
+        response = client.get('/venues')
+    assert response.status_code == 200
+    return statements
+
+def test_venues_statement_count_is_constant(seeded_app):
+    small = venues_statements(seeded_app(venues=5, artists=5, shows=20))
+    large = venues_statements(seeded_app(venues=500, artists=50, shows=2000))
+    assert len(small) == len(large) == 1
+
+def test_venues_lists_every_venue_by_area(seeded_app):
+    app = seeded_app(venues=40, artists=10, shows=100)
+    body = app.test_client().get('/venues').get_data(as_text=True)
+    assert len(set(re.findall(r'href="/venues/(\d+)"', body))) == 40
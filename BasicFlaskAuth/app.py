@@ -1,15 +1,25 @@
 from flask import Flask, request, abort
 import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from functools import wraps
-from jose import jwt
+from jose import jwk, jwt
 from urllib.request import urlopen
 
 
 app = Flask(__name__)
 
-AUTH0_DOMAIN = @TODO_REPLACE_WITH_YOUR_DOMAIN
+AUTH0_DOMAIN = '@TODO_REPLACE_WITH_YOUR_DOMAIN'
 ALGORITHMS = ['RS256']
-API_AUDIENCE = @TODO_REPLACE_WITH_YOUR_API_AUDIENCE
+API_AUDIENCE = '@TODO_REPLACE_WITH_YOUR_API_AUDIENCE'
+JWKS_TTL = 600
+JWKS_MIN_REFETCH_INTERVAL = 30
+TOKEN_CACHE_SIZE = 10000
+# seconds a token is still accepted past its exp, by jose and the token cache
+JWT_LEEWAY = 0
 
 
 class AuthError(Exception):
@@ -51,26 +61,120 @@ def get_token_auth_header():
     return token
 
 
+def url_fetcher(url):
+    """Returns a fetcher that downloads the JSON Web Key Set from url
+    """
+    def fetch():
+        with urlopen(url, timeout=5) as response:
+            return json.loads(response.read())
+    return fetch
+
+
+def file_fetcher(path):
+    """Returns a fetcher that reads the JSON Web Key Set from a local file
+    """
+    def fetch():
+        with open(path) as jwks_file:
+            return json.load(jwks_file)
+    return fetch
+
+
+class JWKSCache:
+    """Signing keys by kid, built once per key set fetch
+
+    Every fetch runs on a background thread and there is at most one in
+    flight: the first request, a refresh and an unknown kid all share it.
+    Once the key set is older than ttl it keeps being served while the
+    refresh runs. An unknown kid waits for the fetch in flight, or starts
+    one if the last fetch started at least min_refetch_interval seconds ago,
+    so random kids can't hammer the JWKS url.
+    """
+
+    def __init__(self, fetcher, ttl=JWKS_TTL, min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL,
+                 clock=time.monotonic):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.min_refetch_interval = min_refetch_interval
+        self.clock = clock
+        self._keys = {}
+        self._fetched_at = None
+        self._started_at = None
+        self._pending = None
+        self._state_lock = threading.Lock()
+
+    def get_key(self, kid):
+        if self._fetched_at is None:
+            self._fetch().result()
+        elif self.clock() - self._fetched_at > self.ttl:
+            # stale while revalidate: this request keeps the old keys, and
+            # a failing JWKS url is retried at most every min_refetch_interval
+            self._fetch(min_interval=self.min_refetch_interval)
+
+        key = self._keys.get(kid)
+        if key is None:
+            pending = self._fetch(min_interval=self.min_refetch_interval)
+            if pending is not None:
+                pending.result()
+                key = self._keys.get(kid)
+        return key
+
+    def _fetch(self, min_interval=None):
+        """Returns the fetch in flight, or starts one
+
+        With min_interval, no new fetch starts if the last one started less
+        than min_interval seconds ago; None is returned instead.
+        """
+        with self._state_lock:
+            if self._pending is None:
+                if (min_interval is not None and self._started_at is not None
+                        and self.clock() - self._started_at < min_interval):
+                    return None
+                self._pending = Future()
+                self._started_at = self.clock()
+                threading.Thread(target=self._run_fetch, args=(self._pending,), daemon=True).start()
+            return self._pending
+
+    def _run_fetch(self, pending):
+        try:
+            keys = self._build_keys()
+        except Exception as error:
+            # stale keys keep being served; waiting requests get the error
+            with self._state_lock:
+                self._pending = None
+            pending.set_exception(error)
+            return
+        with self._state_lock:
+            self._keys = keys
+            self._fetched_at = self.clock()
+            self._pending = None
+        pending.set_result(keys)
+
+    def _build_keys(self):
+        jwks = self.fetcher()
+        keys = {}
+        for key in jwks['keys']:
+            keys[key['kid']] = jwk.construct({
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key['use'],
+                'n': key['n'],
+                'e': key['e']
+            }, algorithm=ALGORITHMS[0])
+        return keys
+
+
+jwks_cache = JWKSCache(url_fetcher(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'))
+
+
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    rsa_key = jwks_cache.get_key(unverified_header['kid'])
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -78,7 +182,8 @@ def verify_decode_jwt(token):
                 rsa_key,
                 algorithms=ALGORITHMS,
                 audience=API_AUDIENCE,
-                issuer='https://' + AUTH0_DOMAIN + '/'
+                issuer='https://' + AUTH0_DOMAIN + '/',
+                options={'leeway': JWT_LEEWAY}
             )
 
             return payload
@@ -105,14 +210,86 @@ def verify_decode_jwt(token):
             }, 400)
 
 
+class TokenCache:
+    """Payloads of already verified tokens, keyed by a digest of the token
+    and the audience it was verified for
+
+    An entry lives until the token's exp, compared the way jose does (whole
+    seconds, the same leeway), so a cached token expires exactly when
+    verify_decode_jwt would start rejecting it. Tokens without exp are not
+    cached. Past maxsize the least recently used entry is evicted.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, leeway=JWT_LEEWAY, clock=time.time):
+        self.maxsize = maxsize
+        self.leeway = leeway
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _digest(token, audience):
+        return hashlib.sha256('{}\0{}'.format(audience, token).encode('utf-8')).digest()
+
+    def get(self, token, audience):
+        digest = self._digest(token, audience)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, exp = entry
+            # jose: exp < now - leeway, with now in whole seconds
+            if exp < int(self.clock()) - self.leeway:
+                del self._entries[digest]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return dict(payload)
+
+    def put(self, token, audience, payload):
+        exp = payload.get('exp')
+        if not isinstance(exp, (int, float)):
+            return
+        digest = self._digest(token, audience)
+        with self._lock:
+            self._entries[digest] = (dict(payload), int(exp))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+token_cache = TokenCache()
+
+
 def requires_auth(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         token = get_token_auth_header()
-        try:
-            payload = verify_decode_jwt(token)
-        except:
-            abort(401)
+        payload = token_cache.get(token, API_AUDIENCE)
+        if payload is None:
+            try:
+                payload = verify_decode_jwt(token)
+            except:
+                abort(401)
+            token_cache.put(token, API_AUDIENCE, payload)
         return f(payload, *args, **kwargs)
 
     return wrapper
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+import rsa
+from jose import jwk, jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as auth
+
+
+class SigningKey:
+    """An RSA key pair: signs tokens and describes itself as a JWKS entry
+    """
+
+    def __init__(self, kid):
+        self.kid = kid
+        # rsa comes with python-jose, whichever backend it uses
+        _, private = rsa.newkeys(1024)
+        self.pem = private.save_pkcs1()
+        public = jwk.construct(self.pem, algorithm='RS256').public_key().to_dict()
+        self.jwk = {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'n': public['n'], 'e': public['e']}
+
+    def sign(self, claims):
+        return jwt.encode(claims, self.pem, algorithm='RS256', headers={'kid': self.kid})
+
+
+class CountingFetcher:
+    """Serves a JWKS file through file_fetcher, counting fetches; a fetch
+    blocks while `gate` is cleared and raises `error` when set
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fetch = auth.file_fetcher(path)
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+        self.error = None
+
+    def write(self, *keys):
+        with open(self.path, 'w') as jwks_file:
+            json.dump({'keys': [key.jwk for key in keys]}, jwks_file)
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.fetch()
+
+
+class Clock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(scope='session')
+def keys():
+    # key generation is slow, so the same two keys serve every test
+    return SigningKey('first'), SigningKey('second')
+
+@pytest.fixture
+def fetcher(tmpdir, keys):
+    fetcher = CountingFetcher(str(tmpdir.join('jwks.json')))
+    fetcher.write(keys[0])
+    return fetcher
+
+@pytest.fixture
+def clock():
+    return Clock()
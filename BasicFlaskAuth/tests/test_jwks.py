@@ -0,0 +1,69 @@
+import threading
+
+from app import JWKSCache
+
+def test_keys_are_fetched_once_within_ttl(fetcher, clock, keys):
+    cache = JWKSCache(fetcher, ttl=600, clock=clock)
+    first = cache.get_key('first')
+    clock.now += 599
+    assert cache.get_key('first') is first
+    assert fetcher.calls == 1
+
+def test_stale_keys_are_served_while_refreshing(fetcher, clock, keys):
+    cache = JWKSCache(fetcher, ttl=600, clock=clock)
+    stale = cache.get_key('first')
+    fetcher.write(keys[0], keys[1])
+    fetcher.gate.clear()
+    fetcher.started.clear()
+    clock.now += 601
+    # the refresh is blocked, yet the stale key comes back at once
+    assert cache.get_key('first') is stale
+    assert fetcher.started.wait(5)
+    refresh = cache._pending
+    fetcher.gate.set()
+    refresh.result(5)
+    assert cache.get_key('second') is not None
+    assert cache.get_key('first') is not stale
+    assert fetcher.calls == 2
+
+def test_unknown_kid_joins_the_refresh_in_flight(fetcher, clock, keys):
+    cache = JWKSCache(fetcher, ttl=600, min_refetch_interval=30, clock=clock)
+    cache.get_key('first')
+    fetcher.write(keys[0], keys[1])
+    fetcher.gate.clear()
+    clock.now += 601
+    cache.get_key('first')
+    # a refresh is in flight; every request for the new kid waits for it
+    found = []
+    threads = [threading.Thread(target=lambda: found.append(cache.get_key('second'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    fetcher.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(found) == 8 and all(key is not None for key in found)
+    assert fetcher.calls == 2
+
+def test_unknown_kid_refetches_are_rate_limited(fetcher, clock, keys):
+    cache = JWKSCache(fetcher, ttl=600, min_refetch_interval=30, clock=clock)
+    cache.get_key('first')
+    clock.now += 10
+    assert cache.get_key('random') is None
+    assert fetcher.calls == 1
+    clock.now += 25
+    assert cache.get_key('random') is None
+    assert fetcher.calls == 2
+    assert cache.get_key('random') is None
+    assert fetcher.calls == 2
+
+def test_failed_refresh_keeps_stale_keys(fetcher, clock, keys):
+    cache = JWKSCache(fetcher, ttl=600, clock=clock)
+    stale = cache.get_key('first')
+    fetcher.error = OSError('JWKS url unreachable')
+    fetcher.gate.clear()
+    clock.now += 601
+    assert cache.get_key('first') is stale
+    refresh = cache._pending
+    fetcher.gate.set()
+    assert isinstance(refresh.exception(5), OSError)
+    assert cache.get_key('first') is stale
@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+
+import jose.jwt
+import pytest
+
+import app as auth
+from app import JWKSCache, TokenCache
+
+DOMAIN = 'fyyur.example.com'
+AUDIENCE = 'fyyur-api'
+
+@pytest.fixture
+def server(monkeypatch, fetcher, keys):
+    # the app wired to the local key set, with an empty token cache; yields
+    # the test client and the number of signature checks so far
+    monkeypatch.setattr(auth, 'AUTH0_DOMAIN', DOMAIN)
+    monkeypatch.setattr(auth, 'API_AUDIENCE', AUDIENCE)
+    monkeypatch.setattr(auth, 'jwks_cache', JWKSCache(fetcher))
+    monkeypatch.setattr(auth, 'token_cache', TokenCache())
+    decodes = []
+    decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decodes.append(args[0])
+        return decode(*args, **kwargs)
+    monkeypatch.setattr(auth.jwt, 'decode', counting_decode)
+    return auth.app.test_client(), decodes
+
+def claims(exp, audience=AUDIENCE):
+    return {'iss': 'https://{}/'.format(DOMAIN), 'aud': audience, 'sub': 'auth0|1', 'exp': exp}
+
+def get(client, token):
+    return client.get('/headers', headers={'Authorization': 'Bearer ' + token}).status_code
+
+def test_repeat_requests_skip_verification(server, keys):
+    client, decodes = server
+    token = keys[0].sign(claims(int(datetime.now(timezone.utc).timestamp()) + 3600))
+    assert get(client, token) == 200
+    assert get(client, token) == 200
+    assert len(decodes) == 1
+    assert auth.token_cache.stats() == {'size': 1, 'hits': 1, 'misses': 1, 'evictions': 0, 'expirations': 0}
+
+def test_audience_is_checked_even_when_cached(server, keys, monkeypatch):
+    client, decodes = server
+    exp = int(datetime.now(timezone.utc).timestamp()) + 3600
+    assert get(client, keys[0].sign(claims(exp, audience='another-api'))) == 401
+    token = keys[0].sign(claims(exp))
+    assert get(client, token) == 200
+    # verified for one audience, the token is not reused for another
+    monkeypatch.setattr(auth, 'API_AUDIENCE', 'another-api')
+    assert get(client, token) == 401
+
+@pytest.mark.parametrize('leeway', [0, 5])
+@pytest.mark.parametrize('offset', [-1.0, -0.5, 0.0, 0.5, 0.99, 1.0, 5.0, 5.5, 6.0])
+def test_expiry_matches_jose(keys, monkeypatch, leeway, offset):
+    # at `offset` seconds past exp, the cache serves the token exactly when
+    # jose still accepts it
+    exp = 2000000000
+    now = exp + offset
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(now, tz)
+    monkeypatch.setattr(jose.jwt, 'datetime', FrozenDatetime)
+    token = keys[0].sign(claims(exp))
+    try:
+        jose.jwt.decode(token, keys[0].jwk, algorithms=['RS256'], audience=AUDIENCE,
+                        options={'leeway': leeway})
+        accepted = True
+    except jose.jwt.ExpiredSignatureError:
+        accepted = False
+    cache = TokenCache(leeway=leeway, clock=lambda: now)
+    cache.put(token, AUDIENCE, claims(exp))
+    assert (cache.get(token, AUDIENCE) is not None) == accepted
+
+def test_least_recently_used_token_is_evicted():
+    cache = TokenCache(maxsize=2, clock=lambda: 1000)
+    for token in ('a', 'b'):
+        cache.put(token, AUDIENCE, {'exp': 2000})
+    assert cache.get('a', AUDIENCE) is not None
+    cache.put('c', AUDIENCE, {'exp': 2000})
+    assert cache.get('b', AUDIENCE) is None
+    assert cache.get('a', AUDIENCE) is not None
+    assert cache.get('c', AUDIENCE) is not None
+    assert cache.stats() == {'size': 2, 'hits': 3, 'misses': 1, 'evictions': 1, 'expirations': 0}
+
+def test_expired_entries_are_dropped():
+    now = [1000]
+    cache = TokenCache(clock=lambda: now[0])
+    cache.put('a', AUDIENCE, {'exp': 1000})
+    cache.put('no-exp', AUDIENCE, {'sub': 'x'})
+    assert cache.get('a', AUDIENCE) is not None
+    now[0] = 1001
+    assert cache.get('a', AUDIENCE) is None
+    assert cache.get('no-exp', AUDIENCE) is None
+    assert cache.stats() == {'size': 0, 'hits': 1, 'misses': 2, 'evictions': 0, 'expirations': 1}